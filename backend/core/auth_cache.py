@@ -0,0 +1,50 @@
+"""
+Short-lived cache of user documents for authenticated requests
+"""
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+
+from db import users_collection
+
+USER_CACHE_TTL = 30
+
+# Fields needed by protected routes; everything else (password hash,
+# timestamps) stays in Mongo
+USER_PROJECTION = {
+    "_id": 0,
+    "email": 1,
+    "full_name": 1,
+    "phone_number": 1,
+    "primary_crops": 1,
+    "farm_size": 1,
+    "village": 1,
+    "state": 1,
+}
+
+_user_cache = TTLCache(maxsize=5000, ttl=USER_CACHE_TTL)
+_user_cache_lock = Lock()
+
+
+async def get_user_cached(email: str) -> Optional[Dict[str, Any]]:
+    """Return the projected user document for email, or None if missing."""
+    with _user_cache_lock:
+        user = _user_cache.get(email)
+    if user is not None:
+        return dict(user)
+
+    user = await users_collection.find_one({"email": email}, USER_PROJECTION)
+    if user is None:
+        # Unknown users are not cached so a fresh signup is seen immediately
+        return None
+
+    with _user_cache_lock:
+        _user_cache[email] = user
+    return dict(user)
+
+
+def invalidate_user(email: str) -> None:
+    """Drop a cached user after its document has been written."""
+    with _user_cache_lock:
+        _user_cache.pop(email, None)
@@ -0,0 +1,57 @@
+"""
+Shared authentication dependency for protected routes
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+
+from core.auth_cache import get_user_cached
+from core.security import decode_access_token
+
+security = HTTPBearer()
+
+
+@dataclass(slots=True)
+class AuthUser:
+    """Authenticated farmer, built from the cached user document"""
+    email: str
+    full_name: str = ""
+    farm_size: str = ""
+    primary_crops: List[str] = field(default_factory=list)
+    phone_number: str = ""
+    village: Optional[str] = None
+    state: Optional[str] = None
+
+    @classmethod
+    def from_document(cls, user: Dict[str, Any]) -> "AuthUser":
+        return cls(
+            email=user["email"],
+            full_name=user.get("full_name", ""),
+            farm_size=user.get("farm_size", ""),
+            primary_crops=user.get("primary_crops") or [],
+            phone_number=user.get("phone_number", ""),
+            village=user.get("village"),
+            state=user.get("state"),
+        )
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> AuthUser:
+    """Resolve the bearer token to a user via the token and user caches"""
+    payload = decode_access_token(credentials.credentials)
+    if not payload:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    email = payload.get("email")
+    if not email:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+
+    # Verify user still exists in database
+    user = await get_user_cached(email)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    return AuthUser.from_document(user)
@@ -1,7 +1,8 @@
 """
 RAG Configuration Management for Krishi Mitra
 """
-from functools import lru_cache
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -13,6 +14,8 @@ class Settings(BaseSettings):
     pinecone_api_key: str = Field(..., env="PINECONE_API_KEY")
     pinecone_environment: str = Field("us-east-1", env="PINECONE_ENVIRONMENT")
     pinecone_index_name: str = Field("krishimitra-knowledge", env="PINECONE_INDEX_NAME")
+    # "http" (default) or "grpc" to multiplex queries over one HTTP/2 channel
+    pinecone_transport: str = Field("http", env="PINECONE_TRANSPORT")
     
     # Embedding Model Configuration
     embedding_model_name: str = Field(
@@ -20,6 +23,13 @@ class Settings(BaseSettings):
         env="EMBEDDING_MODEL_NAME"
     )
     embedding_dimension: int = Field(768, env="EMBEDDING_DIMENSION")
+    # "torch" (default) or "onnx" for an export from export_embedding_onnx.py
+    embedding_backend: str = Field("torch", env="EMBEDDING_BACKEND")
+    embedding_onnx_file: Optional[str] = Field(None, env="EMBEDDING_ONNX_FILE")
+    embedding_cache_size: int = Field(4096, env="EMBEDDING_CACHE_SIZE")
+    embedding_cache_ttl: int = Field(86400, env="EMBEDDING_CACHE_TTL")  # seconds
+    embedding_batch_size: int = Field(32, env="EMBEDDING_BATCH_SIZE")
+    embedding_batch_window_ms: float = Field(5.0, env="EMBEDDING_BATCH_WINDOW_MS")
     
     # LLM Configuration
     llm_provider: str = Field("gemini", env="LLM_PROVIDER")
@@ -29,10 +39,25 @@ class Settings(BaseSettings):
     # Retrieval Configuration
     default_top_k: int = Field(5, env="DEFAULT_TOP_K")
     max_top_k: int = Field(20, env="MAX_TOP_K")
+    retrieval_cache_size: int = Field(5000, env="RETRIEVAL_CACHE_SIZE")
+    retrieval_cache_ttl: int = Field(600, env="RETRIEVAL_CACHE_TTL")  # seconds
+    # Optional cross-encoder reranking (e.g. BAAI/bge-reranker-base); unset disables it.
+    # RERANK_CANDIDATES chunks are fetched, and the request's top_k are kept
+    rerank_model: Optional[str] = Field(None, env="RERANK_MODEL")
+    rerank_backend: str = Field("torch", env="RERANK_BACKEND")
+    rerank_onnx_file: Optional[str] = Field(None, env="RERANK_ONNX_FILE")
+    rerank_candidates: int = Field(20, env="RERANK_CANDIDATES")
+    # "pinecone" (default) or "faiss" for a local copy from export_pinecone_faiss.py
+    retrieval_backend: str = Field("pinecone", env="RETRIEVAL_BACKEND")
+    local_index_path: str = Field("models/knowledge.faiss", env="LOCAL_INDEX_PATH")
     
     # Generation Configuration
     max_tokens: int = Field(1000, env="MAX_TOKENS")
     temperature: float = Field(0.7, env="TEMPERATURE")
+    max_context_tokens: int = Field(3000, env="MAX_CONTEXT_TOKENS")  # retrieved-context budget per prompt
+    gemini_concurrency: int = Field(16, env="GEMINI_CONCURRENCY")  # max in-flight async Gemini calls per worker
+    answer_cache_size: int = Field(512, env="ANSWER_CACHE_SIZE")
+    answer_cache_ttl: int = Field(3600, env="ANSWER_CACHE_TTL")  # seconds
     
     # LangGraph Configuration
     graph_timeout: int = Field(30, env="GRAPH_TIMEOUT")  # seconds
@@ -47,7 +72,10 @@ class Settings(BaseSettings):
         extra = "ignore"  # Ignore extra fields from .env (like MongoDB, JWT settings)
 
 
-@lru_cache()
+# Settings are read once at import; every caller shares this instance
+settings = Settings()
+
+
 def get_settings() -> Settings:
-    """Get cached settings instance"""
-    return Settings()
+    """Get the shared settings instance"""
+    return settings
@@ -3,10 +3,19 @@ Structured Logging for RAG Pipeline
 """
 import logging
 import sys
+from functools import lru_cache
 from typing import Any, Dict
-import json
 from datetime import datetime
 
+import orjson
+
+_ORJSON_OPTS = orjson.OPT_UTC_Z | orjson.OPT_NAIVE_UTC
+
+
+def _dumps(data: Dict[str, Any]) -> str:
+    """Serialize log fields to JSON (naive datetimes are rendered as UTC)"""
+    return orjson.dumps(data, option=_ORJSON_OPTS, default=str).decode()
+
 
 class StructuredLogger:
     """Structured logger for better observability"""
@@ -15,17 +24,16 @@ class StructuredLogger:
         self.logger = logging.getLogger(name)
         self.logger.setLevel(logging.INFO)
         
-        # Create console handler with structured format
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setLevel(logging.INFO)
-        
-        # Use JSON formatter for structured logs
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        handler.setFormatter(formatter)
-        
         if not self.logger.handlers:
+            # Create console handler with structured format
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setLevel(logging.INFO)
+            
+            # Use JSON formatter for structured logs
+            formatter = logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            )
+            handler.setFormatter(formatter)
             self.logger.addHandler(handler)
     
     def log_node_execution(
@@ -40,12 +48,12 @@ class StructuredLogger:
             "node": node_name,
             "latency_ms": latency_ms,
             "status": status,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": datetime.utcnow()
         }
         if metadata:
             log_data.update(metadata)
         
-        self.logger.info(f"Node Execution: {json.dumps(log_data)}")
+        self.logger.info(f"Node Execution: {_dumps(log_data)}")
     
     def log_query_metrics(
         self,
@@ -64,30 +72,31 @@ class StructuredLogger:
             "generation_latency_ms": generation_latency_ms,
             "num_chunks": num_chunks,
             "success": success,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": datetime.utcnow()
         }
         
-        self.logger.info(f"Query Metrics: {json.dumps(log_data)}")
+        self.logger.info(f"Query Metrics: {_dumps(log_data)}")
     
     def info(self, message: str, **kwargs):
         """Log info message"""
         if kwargs:
-            message = f"{message} - {json.dumps(kwargs)}"
+            message = f"{message} - {_dumps(kwargs)}"
         self.logger.info(message)
     
     def error(self, message: str, **kwargs):
         """Log error message"""
         if kwargs:
-            message = f"{message} - {json.dumps(kwargs)}"
+            message = f"{message} - {_dumps(kwargs)}"
         self.logger.error(message)
     
     def warning(self, message: str, **kwargs):
         """Log warning message"""
         if kwargs:
-            message = f"{message} - {json.dumps(kwargs)}"
+            message = f"{message} - {_dumps(kwargs)}"
         self.logger.warning(message)
 
 
+@lru_cache(maxsize=None)
 def get_logger(name: str) -> StructuredLogger:
-    """Get a structured logger instance"""
+    """Get the structured logger instance for name (created once per name)"""
     return StructuredLogger(name)
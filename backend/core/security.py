@@ -1,8 +1,12 @@
 from datetime import datetime, timedelta
+from threading import Lock
+from cachetools import TTLCache
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from dotenv import load_dotenv
+import hashlib
 import os
+import time
 
 # Load .env file
 load_dotenv()
@@ -12,8 +16,27 @@ JWT_SECRET = os.getenv("JWT_SECRET", "your_fallback_secret")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", 60))
 
+# --- Decoded Token Cache ---
+# Verified payloads keyed by a digest of the token (raw tokens are never stored).
+# Entries live at most TOKEN_CACHE_TTL seconds and never past the token's own exp.
+TOKEN_CACHE_TTL = 60
+_token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL)
+_token_cache_lock = Lock()
+
 # --- Argon2 Password Hashing ---
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# Explicit cost parameters (OWASP minimum profile by default) so login latency
+# does not drift with passlib defaults; tune per deployment machine via .env.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", 2))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", 19456))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", 1))
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST,
+    argon2__parallelism=ARGON2_PARALLELISM,
+)
 
 # --- Password Hashing ---
 def hash_password(password: str) -> str:
@@ -24,6 +47,10 @@ def verify_password(password: str, hashed: str) -> bool:
     """Verify password against Argon2 hash."""
     return pwd_context.verify(password, hashed)
 
+def warm_up_password_hashing() -> None:
+    """Load the argon2 backend ahead of the first login/signup."""
+    pwd_context.verify("warmup", pwd_context.hash("warmup"))
+
 # --- JWT Token Creation ---
 def create_access_token(data: dict) -> str:
     """Create a JWT access token with expiration."""
@@ -33,10 +60,36 @@ def create_access_token(data: dict) -> str:
     return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 # --- JWT Token Decoding ---
+def _token_cache_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
 def decode_access_token(token: str):
-    """Decode JWT and return payload if valid."""
+    """Decode JWT and return payload if valid (cached until expiry)."""
+    key = _token_cache_key(token)
+    now = time.time()
+
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+    if cached is not None:
+        payload, exp = cached
+        if exp > now:
+            return dict(payload)
+        with _token_cache_lock:
+            _token_cache.pop(key, None)
+
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
     except JWTError:
         return None
+
+    # Only cache tokens carrying an exp claim, and never beyond it
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)) and exp > now:
+        with _token_cache_lock:
+            _token_cache[key] = (payload, min(now + TOKEN_CACHE_TTL, exp))
+    return dict(payload)
+
+def clear_token_cache() -> None:
+    """Drop all cached token payloads (e.g. after rotating JWT_SECRET)."""
+    with _token_cache_lock:
+        _token_cache.clear()
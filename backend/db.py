@@ -1,25 +1,38 @@
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
 MONGO_URL = os.getenv("MONGO_URL")
-client = MongoClient(MONGO_URL)
+
+# Explicit pool sizing and fail-fast timeouts (overridable via .env)
+client = AsyncMongoClient(
+    MONGO_URL,
+    maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", 100)),
+    minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", 10)),
+    maxIdleTimeMS=int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60000)),
+    serverSelectionTimeoutMS=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 2000)),
+    connectTimeoutMS=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 2000)),
+    socketTimeoutMS=int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 10000)),
+    retryWrites=True,
+)
 db = client["krishi_mitra"]
 users_collection = db["users"]
 
-# Create unique index on email
-try:
-    users_collection.create_index("email", unique=True)
-    print("✅ Email index created successfully!")
-except Exception as e:
-    print("⚠️ Email index creation failed (might already exist):", e)
 
-# Test connection
-try:
-    client.server_info()
-    print("✅ MongoDB connected successfully!")
-except Exception as e:
-    print("❌ MongoDB connection failed:", e)
+async def init_db():
+    """Create indexes and verify the connection (run once at startup)."""
+    # Create unique index on email
+    try:
+        await users_collection.create_index("email", unique=True)
+        print("✅ Email index created successfully!")
+    except Exception as e:
+        print("⚠️ Email index creation failed (might already exist):", e)
 
+    # Test connection
+    try:
+        await client.admin.command("ping")
+        print("✅ MongoDB connected successfully!")
+    except Exception as e:
+        print("❌ MongoDB connection failed:", e)
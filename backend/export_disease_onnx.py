@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+One-off export of the crop disease Keras model to ONNX
+
+Requires the conversion tool, which is not a runtime dependency:
+    pip install tf2onnx
+
+Run from the backend directory:
+    python export_disease_onnx.py
+
+The exported graph takes raw uint8 pixels and does the [0, 1] scaling
+itself, matching what CropDiseaseDetector feeds it. The detector picks up
+the .onnx automatically as long as it is not older than the .keras file;
+re-run this after retraining.
+"""
+import tensorflow as tf
+import tf2onnx
+
+KERAS_PATH = "models/trained_model.keras"
+ONNX_PATH = "models/trained_model.onnx"
+
+
+def main():
+    model = tf.keras.models.load_model(KERAS_PATH)
+    input_signature = [tf.TensorSpec([None, 128, 128, 3], tf.uint8, name="input")]
+
+    @tf.function(input_signature=input_signature)
+    def serve(x):
+        return model(tf.cast(x, tf.float32) * (1.0 / 255.0), training=False)
+
+    tf2onnx.convert.from_function(serve, input_signature=input_signature, opset=15, output_path=ONNX_PATH)
+    print(f"✅ Exported {KERAS_PATH} -> {ONNX_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+One-off export of the query embedding model to ONNX, plus an INT8 variant
+
+Requires the ONNX extras for sentence-transformers:
+    pip install "sentence-transformers[onnx]"
+
+Run from the backend directory:
+    python export_embedding_onnx.py [avx512_vnni|avx2|arm64]
+
+Then set in .env:
+    EMBEDDING_MODEL_NAME=models/embedding-onnx
+    EMBEDDING_BACKEND=onnx
+    EMBEDDING_ONNX_FILE=onnx/model_qint8_<config>.onnx   (omit for FP32)
+
+The exported model must embed into the same space as the Pinecone index;
+spot-check retrieval results before switching production over.
+"""
+import sys
+
+from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+from core.config import get_settings
+
+OUTPUT_DIR = "models/embedding-onnx"
+
+
+def main():
+    quantization_config = sys.argv[1] if len(sys.argv) > 1 else "avx512_vnni"
+    model_name = get_settings().embedding_model_name
+
+    # backend="onnx" exports the transformer to onnx/model.onnx on load
+    model = SentenceTransformer(model_name, backend="onnx")
+    model.save_pretrained(OUTPUT_DIR)
+
+    # Dynamic INT8 quantization; writes onnx/model_qint8_<config>.onnx
+    export_dynamic_quantized_onnx_model(model, quantization_config, OUTPUT_DIR)
+    print(f"✅ Exported {model_name} -> {OUTPUT_DIR} (FP32 + INT8 {quantization_config})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+One-off export of the fertilizer XGBoost pipeline to ONNX
+
+Requires the conversion tools, which are not runtime dependencies:
+    pip install skl2onnx onnxmltools
+
+Run from the backend directory:
+    python export_fertilizer_onnx.py
+"""
+import joblib
+from onnxmltools.convert.xgboost.operator_converters.XGBoost import convert_xgboost
+from skl2onnx import convert_sklearn, update_registered_converter
+from skl2onnx.common.data_types import FloatTensorType
+from skl2onnx.common.shape_calculator import calculate_linear_classifier_output_shapes
+from xgboost import XGBClassifier
+
+PIPELINE_PATH = "models/xgb_pipeline.joblib"
+ONNX_PATH = "models/xgb_pipeline.onnx"
+NUM_FEATURES = 8
+
+
+def main():
+    update_registered_converter(
+        XGBClassifier,
+        "XGBoostXGBClassifier",
+        calculate_linear_classifier_output_shapes,
+        convert_xgboost,
+        options={"nocl": [True, False], "zipmap": [True, False, "columns"]},
+    )
+
+    pipeline = joblib.load(PIPELINE_PATH)
+    onnx_model = convert_sklearn(
+        pipeline,
+        initial_types=[("input", FloatTensorType([None, NUM_FEATURES]))],
+        options={id(pipeline.steps[-1][1]): {"zipmap": False}},
+        target_opset={"": 17, "ai.onnx.ml": 3},
+    )
+
+    with open(ONNX_PATH, "wb") as f:
+        f.write(onnx_model.SerializeToString())
+    print(f"✅ Exported {PIPELINE_PATH} -> {ONNX_PATH}")
+
+
+if __name__ == "__main__":
+    main()
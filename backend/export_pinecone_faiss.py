@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Copy the Pinecone knowledge index to a local Faiss index
+
+Run from the backend directory:
+    python export_pinecone_faiss.py
+
+Writes LOCAL_INDEX_PATH (default models/knowledge.faiss) and a
+.meta.json sidecar with the index metric, chunk ids and metadata. Then
+set in .env:
+    RETRIEVAL_BACKEND=faiss
+
+The local index scores like the Pinecone one: cosine indexes are
+L2-normalised and searched by inner product, dotproduct indexes keep raw
+inner product, and euclidean indexes use squared L2 distance.
+
+Corpora up to a few hundred thousand chunks get an exact flat index;
+larger ones get an IVF index whose lists are memory-mapped at load.
+Re-run this after ingesting new documents into Pinecone.
+"""
+import math
+import os
+
+import faiss
+import numpy as np
+import orjson
+from pinecone import Pinecone
+
+from core.config import get_settings
+
+FETCH_BATCH = 100
+FLAT_INDEX_LIMIT = 200_000
+
+FAISS_METRICS = {
+    "cosine": faiss.METRIC_INNER_PRODUCT,
+    "dotproduct": faiss.METRIC_INNER_PRODUCT,
+    "euclidean": faiss.METRIC_L2,
+}
+
+
+def main():
+    settings = get_settings()
+    pc = Pinecone(api_key=settings.pinecone_api_key)
+    metric = pc.describe_index(settings.pinecone_index_name).metric
+    if metric not in FAISS_METRICS:
+        raise SystemExit(f"Unsupported Pinecone metric: {metric}")
+    index = pc.Index(settings.pinecone_index_name)
+
+    ids, vectors, records = [], [], []
+    for id_batch in index.list():
+        for start in range(0, len(id_batch), FETCH_BATCH):
+            fetched = index.fetch(ids=id_batch[start:start + FETCH_BATCH])
+            for vector_id, vector in fetched.vectors.items():
+                ids.append(vector_id)
+                vectors.append(vector.values)
+                records.append({"id": vector_id, "metadata": vector.metadata or {}})
+        print(f"Fetched {len(ids)} vectors...")
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if metric == "cosine":
+        faiss.normalize_L2(matrix)
+    dimension = matrix.shape[1]
+    faiss_metric = FAISS_METRICS[metric]
+
+    if len(matrix) <= FLAT_INDEX_LIMIT:
+        local_index = faiss.IndexFlat(dimension, faiss_metric)
+    else:
+        nlist = int(4 * math.sqrt(len(matrix)))
+        quantizer = faiss.IndexFlat(dimension, faiss_metric)  # must outlive the IVF index
+        local_index = faiss.IndexIVFFlat(quantizer, nlist, faiss_metric)
+        local_index.train(matrix)
+        local_index.nprobe = 16
+    local_index.add(matrix)
+
+    path = settings.local_index_path
+    faiss.write_index(local_index, path)
+    with open(os.path.splitext(path)[0] + ".meta.json", "wb") as f:
+        f.write(orjson.dumps({"metric": metric, "records": records}))
+    print(f"✅ Wrote {local_index.ntotal} {metric} vectors to {path}")
+
+
+if __name__ == "__main__":
+    main()
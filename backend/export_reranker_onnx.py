@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+One-off export of the reranker cross-encoder to ONNX, plus an INT8 variant
+
+Requires the ONNX extras for sentence-transformers:
+    pip install "sentence-transformers[onnx]"
+
+Run from the backend directory (RERANK_MODEL set in .env):
+    python export_reranker_onnx.py [avx512_vnni|avx2|arm64]
+
+Then set in .env:
+    RERANK_MODEL=models/reranker-onnx
+    RERANK_BACKEND=onnx
+    RERANK_ONNX_FILE=onnx/model_qint8_<config>.onnx   (omit for FP32)
+"""
+import sys
+
+from sentence_transformers import CrossEncoder, export_dynamic_quantized_onnx_model
+
+from core.config import get_settings
+
+OUTPUT_DIR = "models/reranker-onnx"
+
+
+def main():
+    quantization_config = sys.argv[1] if len(sys.argv) > 1 else "avx512_vnni"
+    model_name = get_settings().rerank_model
+    if not model_name:
+        sys.exit("Set RERANK_MODEL (e.g. BAAI/bge-reranker-base) first")
+
+    # backend="onnx" exports the transformer to onnx/model.onnx on load
+    model = CrossEncoder(model_name, backend="onnx")
+    model.save_pretrained(OUTPUT_DIR)
+
+    # Dynamic INT8 quantization; writes onnx/model_qint8_<config>.onnx
+    export_dynamic_quantized_onnx_model(model, quantization_config, OUTPUT_DIR)
+    print(f"✅ Exported {model_name} -> {OUTPUT_DIR} (FP32 + INT8 {quantization_config})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+Production server config: gunicorn -c gunicorn.conf.py main:app
+
+Each worker imports the app itself and loads its own models. The app is
+not preloaded in the master: importing it builds the embedding model and
+the fertilizer ONNX Runtime session, whose thread pools do not survive
+a fork.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
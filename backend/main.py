@@ -1,11 +1,21 @@
+import os
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from routers import auth, rag, weather, crop_predict, fertilizer_predict, crop_disease
+from core.security import warm_up_password_hashing
+from db import init_db
+from services.crop_disease_detection import get_crop_disease_detector
+from services.langgraph_pipeline import rag_pipeline
+from services.weather import close_http_client
 
 app = FastAPI(
     title="Krishi Mitra Backend",
     description="Backend API for Krishi Mitra agricultural application with AI-powered RAG system",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -17,6 +27,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup():
+    await init_db()
+    # Pay one-off backend load costs before the first request arrives
+    warm_up_password_hashing()
+    await run_in_threadpool(crop_predict.warmup)
+    await run_in_threadpool(fertilizer_predict.warmup)
+    # Heavier model warm-up is opt-in so dev reloads stay fast
+    if os.getenv("WARM_MODELS") == "1":
+        await rag_pipeline.warmup()
+        await run_in_threadpool(get_crop_disease_detector)
+    else:
+        # Models load on first use; nothing to wait for
+        rag_pipeline.warm = True
+
+@app.on_event("shutdown")
+async def shutdown():
+    await crop_disease.disease_batcher.stop()
+    await crop_predict.crop_batcher.stop()
+    await fertilizer_predict.fertilizer_batcher.stop()
+    await close_http_client()
+
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(rag.router, prefix="/api/v1/rag", tags=["rag"])
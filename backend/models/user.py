@@ -1,6 +1,23 @@
-from pydantic import BaseModel, EmailStr, constr, Field, field_validator
-from typing import List
+from pydantic import AfterValidator, BaseModel, ConfigDict, EmailStr, StringConstraints, constr, Field, field_validator
+from typing import Annotated, List
 from enum import Enum
+import re
+
+# Precompiled character-class scans used by the password validator
+_LETTER_RE = re.compile(r"[^\W\d_]")  # any Unicode letter
+_DIGIT_RE = re.compile(r"\d")
+
+def _lowercase_domain(v: str) -> str:
+    # Match EmailStr normalisation so logins find the stored address
+    local, _, domain = v.rpartition("@")
+    return f"{local}@{domain.lower()}"
+
+# Cheap shape check for hot paths; signup keeps EmailStr for strict validation
+EmailLike = Annotated[
+    str,
+    StringConstraints(strip_whitespace=True, max_length=254, pattern=r"^[^@\s]+@[^@\s]+\.[^@\s]+$"),
+    AfterValidator(_lowercase_domain),
+]
 
 class FarmSize(str, Enum):
     SMALL = "small"
@@ -22,11 +39,9 @@ class UserCreate(BaseModel):
     @classmethod
     def validate_password_strength(cls, v: str) -> str:
         # At least 8 chars, include letters and numbers
-        has_letter = any(c.isalpha() for c in v)
-        has_digit = any(c.isdigit() for c in v)
         if len(v) < 8:
             raise ValueError("Password must be at least 8 characters long")
-        if not has_letter or not has_digit:
+        if not _LETTER_RE.search(v) or not _DIGIT_RE.search(v):
             raise ValueError("Password must include both letters and numbers")
         return v
 
@@ -40,16 +55,19 @@ class UserCreate(BaseModel):
         return cleaned
     
 class UserLogin(BaseModel):
-    email: EmailStr
+    email: EmailLike
     password: str
 
+# Response models carry already-validated data, so fields are plain types
 class UserResponse(BaseModel):
     message: str
-    email: EmailStr
+    email: str
     full_name: str
 
 class UserInfoResponse(BaseModel):
-    email: EmailStr
+    model_config = ConfigDict(from_attributes=True)
+
+    email: str
     full_name: str
     primary_crops: List[str]
     farm_size: str
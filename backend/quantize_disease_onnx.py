@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Static INT8 quantization of the crop disease ONNX model
+
+Run export_disease_onnx.py first, then calibrate on a folder of sample
+leaf images (a few hundred across classes is enough):
+    python quantize_disease_onnx.py path/to/calibration/images
+
+Writes models/trained_model.int8.onnx, which CropDiseaseDetector prefers
+over the FP32 export. Check accuracy on a held-out set before deploying.
+"""
+import os
+import sys
+
+from onnxruntime.quantization import (
+    CalibrationDataReader, QuantFormat, QuantType, quantize_static
+)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from services.crop_disease_detection import CropDiseaseDetector
+
+ONNX_PATH = "models/trained_model.onnx"
+PREPROCESSED_PATH = "models/trained_model.pre.onnx"
+INT8_PATH = "models/trained_model.int8.onnx"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+class LeafImageReader(CalibrationDataReader):
+    """Feeds calibration images through the same preprocessing as inference"""
+
+    def __init__(self, image_dir: str, input_name: str):
+        self.detector = CropDiseaseDetector.__new__(CropDiseaseDetector)
+        self.input_name = input_name
+        self.paths = iter(sorted(
+            os.path.join(root, name)
+            for root, _, files in os.walk(image_dir)
+            for name in files if name.lower().endswith(IMAGE_EXTENSIONS)
+        ))
+
+    def get_next(self):
+        path = next(self.paths, None)
+        if path is None:
+            return None
+        return {self.input_name: self.detector.preprocess_image_from_path(path)}
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit(f"usage: {sys.argv[0]} <calibration image dir>")
+
+    import onnx
+    input_name = onnx.load(ONNX_PATH).graph.input[0].name
+
+    quant_pre_process(ONNX_PATH, PREPROCESSED_PATH)
+    quantize_static(
+        PREPROCESSED_PATH,
+        INT8_PATH,
+        LeafImageReader(sys.argv[1], input_name),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    os.remove(PREPROCESSED_PATH)
+    print(f"✅ Quantized {ONNX_PATH} -> {INT8_PATH}")
+
+
+if __name__ == "__main__":
+    main()
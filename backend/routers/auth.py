@@ -1,42 +1,37 @@
 from fastapi import APIRouter, HTTPException, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime
+from pymongo.errors import DuplicateKeyError
 from db import users_collection
+from core.auth_cache import invalidate_user
+from core.auth_deps import AuthUser, get_current_user
 from models.user import UserCreate, UserLogin, UserResponse, UserInfoResponse
 
-from core.security import hash_password, verify_password, create_access_token, decode_access_token
+from core.security import hash_password, verify_password, create_access_token
 
 router = APIRouter()
-security = HTTPBearer()
+
+# UserCreate fields persisted as-is (basic + farming information)
+SIGNUP_FIELDS = {"email", "full_name", "farm_size", "primary_crops"}
 
 # Signup endpoints
 @router.post("/signup", response_model=UserResponse)
-def signup(user: UserCreate):
+async def signup(user: UserCreate):
     try:
-        # Check if user already exists
-        if users_collection.find_one({"email": user.email}):
-            raise HTTPException(status_code=400, detail="Email already registered")
-        
         # Hash password and create user with farmer information
-        hashed = hash_password(user.password)
-        user_data = {
-            # Basic Information
-            "email": user.email,
-            "password": hashed,
-            "full_name": user.full_name,
-            
-            # Farming Information
-            "farm_size": user.farm_size,
-            "primary_crops": user.primary_crops,
-            
-            # Metadata
-            "created_at": datetime.utcnow()
-        }
+        user_data = user.model_dump(include=SIGNUP_FIELDS)
+        user_data["password"] = await run_in_threadpool(hash_password, user.password)
+        user_data["created_at"] = datetime.utcnow()
         
-        result = users_collection.insert_one(user_data)
+        # Unique index on email rejects duplicates atomically
+        try:
+            result = await users_collection.insert_one(user_data)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="Email already registered")
         
         if not result.inserted_id:
             raise HTTPException(status_code=500, detail="Failed to create user")
+        invalidate_user(user.email)
             
         return {
             "message": "Farmer registration successful", 
@@ -52,17 +47,22 @@ def signup(user: UserCreate):
 
 # Login endpoint
 @router.post("/login")
-def login(user: UserLogin):
+async def login(user: UserLogin):
     try:
         # Find user in database
-        db_user = users_collection.find_one({"email": user.email})
+        db_user = await users_collection.find_one(
+            {"email": user.email}, {"_id": 0, "email": 1, "password": 1}
+        )
         if not db_user:
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         # Verify password
-        if not verify_password(user.password, db_user["password"]):
+        if not await run_in_threadpool(verify_password, user.password, db_user["password"]):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
+        # Refresh cached profile on login
+        invalidate_user(user.email)
+
         # Create JWT token
         token = create_access_token({"email": user.email})
         return {
@@ -76,36 +76,8 @@ def login(user: UserLogin):
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
-# Protected route
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    # Verify user still exists in database
-    email = payload.get("email")
-    if not email:
-        raise HTTPException(status_code=401, detail="Invalid token payload")
-    
-    user = users_collection.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    
-    return payload
-
 @router.get("/user/me", response_model=UserInfoResponse)
-def get_user(current_user: dict = Depends(get_current_user)):
-    # Get full user data from database
-    user = users_collection.find_one({"email": current_user["email"]})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    return {
-        "email": user["email"],
-        "full_name": user["full_name"],
-        "phone_number": user.get("phone_number", ""),
-        "primary_crops": user.get("primary_crops", []),
-        "farm_size": user.get("farm_size", "")
-    }
-
+async def get_user(current_user: AuthUser = Depends(get_current_user)):
+    # Profile fields come from the cached user document; response_model
+    # picks the public fields straight off the AuthUser dataclass
+    return current_user
@@ -1,14 +1,51 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
-import io
-from core.security import decode_access_token
-from db import users_collection
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+from core.auth_deps import AuthUser, get_current_user
 from services.crop_disease_detection import get_crop_disease_detector
+from services.batching import MicroBatcher
 
 router = APIRouter()
-security = HTTPBearer()  # for JWT token
+
+# Largest accepted image. FastAPI has already spooled the multipart body by the
+# time the route runs, so validate_image_upload checks the spooled file's size
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+# Dedicated, bounded pool for TensorFlow inference so it never runs on the
+# event loop and cannot starve the default threadpool used by other routes
+inference_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CROP_DISEASE_WORKERS", min(4, os.cpu_count() or 1))),
+    thread_name_prefix="crop-disease"
+)
+
+# Concurrent requests arriving within a few ms share one model.predict call
+disease_batcher = MicroBatcher(
+    lambda images: get_crop_disease_detector().predict_batch(images),
+    max_batch_size=int(os.getenv("CROP_DISEASE_MAX_BATCH", 16)),
+    max_latency_ms=float(os.getenv("CROP_DISEASE_BATCH_WINDOW_MS", 10)),
+    executor=inference_executor
+)
+
+async def run_inference(image_file, top_k: Optional[int] = 0) -> Dict[str, Any]:
+    """Preprocess on the inference pool, then predict via the micro-batcher"""
+    loop = asyncio.get_running_loop()
+    detector = await loop.run_in_executor(inference_executor, get_crop_disease_detector)
+    if not detector.is_loaded:
+        return detector.predict_disease(image_file)  # returns the not-loaded error
+    
+    try:
+        image = await loop.run_in_executor(inference_executor, detector.preprocess_image, image_file)
+        probabilities = await disease_batcher.submit(image)
+        return detector.build_result(probabilities, top_k=top_k)
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'prediction': None
+        }
 
 # Response schemas
 class DiseaseDetectionResponse(BaseModel):
@@ -24,24 +61,24 @@ class PredictionResult(BaseModel):
     confidence: float
     confidence_percentage: float
 
-# Dependency to get current user from token
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
+def validate_image_upload(file: UploadFile) -> None:
+    """Check type and size of an uploaded image without reading it into memory"""
+    if not file.content_type or not file.content_type.startswith('image/'):
+        raise HTTPException(
+            status_code=400, 
+            detail="File must be an image (JPG, PNG, etc.)"
+        )
     
-    email = payload.get("email")
-    user = users_collection.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+    if file.size == 0:
+        raise HTTPException(status_code=400, detail="Empty file uploaded")
     
-    return user
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Image too large (max 10 MB)")
 
 @router.post("/detect-disease", response_model=DiseaseDetectionResponse)
 async def detect_crop_disease(
     file: UploadFile = File(...),
-    current_user: dict = Depends(get_current_user)
+    current_user: AuthUser = Depends(get_current_user)
 ):
     """
     Detect crop disease from uploaded image
@@ -54,32 +91,21 @@ async def detect_crop_disease(
         Disease detection results
     """
     try:
-        # Validate file type
-        if not file.content_type or not file.content_type.startswith('image/'):
-            raise HTTPException(
-                status_code=400, 
-                detail="File must be an image (JPG, PNG, etc.)"
-            )
-        
-        # Read image data
-        image_data = await file.read()
-        
-        if len(image_data) == 0:
-            raise HTTPException(status_code=400, detail="Empty file uploaded")
+        validate_image_upload(file)
         
-        # Make prediction
-        detector = get_crop_disease_detector()
-        result = detector.predict_disease(image_data)
+        # Make prediction off the event loop, letting PIL read the spooled upload directly
+        result = await run_inference(file.file)
         
         if result['success']:
-            return DiseaseDetectionResponse(
-                success=True,
-                prediction={
+            # Plain dict: FastAPI validates once against response_model
+            return {
+                'success': True,
+                'prediction': {
                     **result['prediction'],
-                    'farmer_email': current_user['email'],
+                    'farmer_email': current_user.email,
                     'filename': file.filename
                 }
-            )
+            }
         else:
             raise HTTPException(
                 status_code=500, 
@@ -94,48 +120,31 @@ async def detect_crop_disease(
 @router.post("/detect-disease-detailed", response_model=Dict[str, Any])
 async def detect_crop_disease_detailed(
     file: UploadFile = File(...),
-    current_user: dict = Depends(get_current_user)
+    top_k: int = Query(5, ge=1, le=38, description="Number of ranked classes to return"),
+    current_user: AuthUser = Depends(get_current_user)
 ):
     """
     Detect crop disease from uploaded image with detailed results
     
     Args:
         file: Uploaded image file (JPG, PNG, etc.)
+        top_k: Number of highest-confidence classes to include
         current_user: Authenticated user
         
     Returns:
-        Detailed disease detection results including all class probabilities
+        Detailed disease detection results including the top_k class probabilities
     """
     try:
-        # Validate file type
-        if not file.content_type or not file.content_type.startswith('image/'):
-            raise HTTPException(
-                status_code=400, 
-                detail="File must be an image (JPG, PNG, etc.)"
-            )
-        
-        # Read image data
-        image_data = await file.read()
+        validate_image_upload(file)
         
-        if len(image_data) == 0:
-            raise HTTPException(status_code=400, detail="Empty file uploaded")
-        
-        # Make prediction
-        detector = get_crop_disease_detector()
-        result = detector.predict_disease(image_data)
+        # Make prediction off the event loop, letting PIL read the spooled upload directly
+        result = await run_inference(file.file, top_k=top_k)
         
         if result['success']:
-            # Add user info to result
-            result['farmer_email'] = current_user['email']
+            # Add user info to result (all_predictions is already ranked)
+            result['farmer_email'] = current_user.email
             result['filename'] = file.filename
             
-            # Sort all predictions by confidence
-            result['all_predictions'] = sorted(
-                result['all_predictions'], 
-                key=lambda x: x['confidence'], 
-                reverse=True
-            )
-            
             return result
         else:
             raise HTTPException(
@@ -157,29 +166,7 @@ def get_supported_crops():
         List of supported crop classes
     """
     try:
-        # Extract unique crops from class names
-        detector = get_crop_disease_detector()
-        crops = set()
-        diseases_by_crop = {}
-        
-        for class_name in detector.class_names:
-            parts = class_name.split('___')
-            crop = parts[0].replace('_', ' ')
-            disease = parts[1].replace('_', ' ') if len(parts) > 1 else 'Unknown'
-            
-            crops.add(crop)
-            
-            if crop not in diseases_by_crop:
-                diseases_by_crop[crop] = []
-            diseases_by_crop[crop].append(disease)
-        
-        return {
-            'supported_crops': sorted(list(crops)),
-            'diseases_by_crop': diseases_by_crop,
-            'total_classes': len(detector.class_names),
-            'all_classes': detector.class_names
-        }
-        
+        return get_crop_disease_detector().get_supported_crops()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving supported crops: {str(e)}")
 
@@ -192,27 +179,6 @@ def get_model_info():
         Model information and status
     """
     try:
-        detector = get_crop_disease_detector()
-        model_loaded = detector.model is not None
-        
-        model_info = {
-            'model_loaded': model_loaded,
-            'model_path': detector.model_path,
-            'total_classes': len(detector.class_names),
-            'input_shape': [128, 128, 3] if model_loaded else None,
-        }
-        
-        if model_loaded and detector.model:
-            try:
-                model_info['model_summary'] = {
-                    'input_shape': detector.model.input_shape,
-                    'output_shape': detector.model.output_shape,
-                    'total_params': detector.model.count_params()
-                }
-            except Exception as e:
-                model_info['model_summary_error'] = str(e)
-        
-        return model_info
-        
+        return get_crop_disease_detector().get_model_info()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving model info: {str(e)}")
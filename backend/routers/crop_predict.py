@@ -1,14 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 import numpy as np
 import pickle
 from pathlib import Path
-from core.security import decode_access_token
-from db import users_collection
+from threading import RLock
+from cachetools import TTLCache
+from core.auth_deps import AuthUser, get_current_user
+from services.batching import MicroBatcher
+from services.singleflight import SingleFlight
 
 router = APIRouter()
-security = HTTPBearer()  # for JWT token
 
 # Load model once (resolve path relative to backend directory)
 MODEL_PATH = Path(__file__).resolve().parent.parent / "models" / "NBClassifier.pkl"
@@ -20,13 +21,43 @@ except FileNotFoundError:
 except Exception as e:
     raise RuntimeError(f"Failed to load crop prediction model: {str(e)}")
 
-# Request schema
+class VectorizedGaussianNB:
+    """NumPy-only predict() for a fitted sklearn GaussianNB"""
+
+    def __init__(self, nb):
+        var = np.asarray(nb.var_, dtype=np.float64)
+        # Parameters are derived in float64 and stored as float32 to match
+        # the float32 request batches
+        self.theta = np.asarray(nb.theta_, dtype=np.float32)
+        self.inv_var = (1.0 / var).astype(np.float32)
+        self.classes = np.asarray(nb.classes_)
+        # Per-class terms that do not depend on the input
+        self.bias = (np.log(nb.class_prior_) - 0.5 * np.sum(np.log(2.0 * np.pi * var), axis=1)).astype(np.float32)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        diff = X[:, None, :] - self.theta[None, :, :]
+        jll = self.bias - 0.5 * np.sum(diff * diff * self.inv_var, axis=2)
+        return self.classes[np.argmax(jll, axis=1)]
+
+# Skip sklearn's Python-side dispatch on the hot path; fall back to the
+# pickled model if it is not a 7-feature GaussianNB
+try:
+    predictor = VectorizedGaussianNB(model)
+    if predictor.theta.shape[1] != 7:
+        raise ValueError(f"expected 7 features, got {predictor.theta.shape[1]}")
+except Exception as e:
+    print(f"⚠️ Using sklearn predict for crop model: {e}")
+    predictor = model
+
+# Request schema; frozen instances are hashable
 class CropFeatures(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     N: float
     P: float
     K: float
-    temperature: float
-    humidity: float
+    temperature: float = Field(description="Temperature in °C")
+    humidity: float = Field(description="Relative humidity in %")
     ph: float
     rainfall: float
 
@@ -59,27 +90,78 @@ class CropFeatures(BaseModel):
             raise ValueError("Values must be non-negative")
         return v
 
-# Dependency to get current user from token
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    email = payload.get("email")
-    user = users_collection.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    
-    return user
+MAX_BATCH = 64
+
+# Row-major float32 batch matrix reused across batches; safe because the
+# batcher's worker runs one batch at a time
+_batch_buffer = np.empty((MAX_BATCH, 7), dtype=np.float32)
+
+def _predict_batch(rows: list) -> list:
+    batch = _batch_buffer[:len(rows)]
+    batch[:] = rows
+    return [str(label) for label in predictor.predict(batch)]
+
+# Concurrent requests are stacked into one GaussianNB predict call
+crop_batcher = MicroBatcher(_predict_batch, max_batch_size=MAX_BATCH, max_latency_ms=5)
+
+def warmup() -> None:
+    """Run one dummy prediction so first-call initialisation happens at startup"""
+    _predict_batch([(0.0,) * 7])
+
+# Recent predictions keyed on quantized features (form retries repeat inputs)
+PREDICTION_CACHE_TTL = 300
+_prediction_cache = TTLCache(maxsize=2048, ttl=PREDICTION_CACHE_TTL)
+_prediction_cache_lock = RLock()
+_cache_hits = 0
+_cache_misses = 0
+# Identical requests arriving before the first result is cached share it
+_prediction_flight = SingleFlight()
+
+def _cache_key(features: CropFeatures) -> tuple:
+    return (
+        round(features.N, 2), round(features.P, 2), round(features.K, 2),
+        round(features.temperature, 1), round(features.humidity, 1),
+        round(features.ph, 2), round(features.rainfall, 1)
+    )
+
+async def _predict_and_cache(key: tuple, row: tuple) -> str:
+    predicted_crop = await crop_batcher.submit(row)
+    with _prediction_cache_lock:
+        _prediction_cache[key] = predicted_crop
+    return predicted_crop
 
 # Protected endpoint
 @router.post("/predict")
-def predict_crop(features: CropFeatures, current_user: dict = Depends(get_current_user)):
+async def predict_crop(features: CropFeatures, current_user: AuthUser = Depends(get_current_user)):
+    global _cache_hits, _cache_misses
     try:
-        data = np.array([[features.N, features.P, features.K, features.temperature,
-                          features.humidity, features.ph, features.rainfall]])
-        prediction = model.predict(data)
-        return {"predicted_crop": prediction[0], "farmer_email": current_user["email"]}
+        key = _cache_key(features)
+        with _prediction_cache_lock:
+            predicted_crop = _prediction_cache.get(key)
+            if predicted_crop is not None:
+                _cache_hits += 1
+            else:
+                _cache_misses += 1
+        
+        if predicted_crop is None:
+            row = (features.N, features.P, features.K, features.temperature,
+                   features.humidity, features.ph, features.rainfall)
+            predicted_crop = await _prediction_flight.do(key, lambda: _predict_and_cache(key, row))
+        
+        return {"predicted_crop": predicted_crop, "farmer_email": current_user.email}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/predict/cache_stats")
+def prediction_cache_stats():
+    """Hit-rate statistics for the crop prediction cache"""
+    with _prediction_cache_lock:
+        total = _cache_hits + _cache_misses
+        return {
+            "hits": _cache_hits,
+            "misses": _cache_misses,
+            "hit_rate": round(_cache_hits / total, 4) if total else 0.0,
+            "size": len(_prediction_cache),
+            "maxsize": _prediction_cache.maxsize,
+            "ttl_seconds": PREDICTION_CACHE_TTL
+        }
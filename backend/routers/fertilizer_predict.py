@@ -1,13 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 import numpy as np
 import joblib
-from core.security import decode_access_token
-from db import users_collection
+import os
+from core.auth_deps import AuthUser, get_current_user
+from services.batching import MicroBatcher
+from services.singleflight import SingleFlight
 
 router = APIRouter()
-security = HTTPBearer()
 
 # Load model and fertilizer mapping once
 try:
@@ -19,8 +19,38 @@ except Exception as e:
     xgb_model = None
     fert_dict = {}
 
+# Label -> fertilizer name as a dense array (labels are contiguous ints);
+# the extra trailing slot holds "Unknown" for out-of-range labels
+FERT_NAMES = np.array(
+    [fert_dict.get(i, "Unknown") for i in range(max(map(int, fert_dict), default=-1) + 1)] + ["Unknown"],
+    dtype=object
+)
+
+# Optional ONNX Runtime session for the same pipeline (see export_fertilizer_onnx.py)
+ONNX_MODEL_PATH = "models/xgb_pipeline.onnx"
+
+def _load_onnx_session(path: str):
+    if not os.path.exists(path):
+        return None
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+try:
+    onnx_session = _load_onnx_session(ONNX_MODEL_PATH)
+    if onnx_session is not None:
+        onnx_input = onnx_session.get_inputs()[0].name
+        onnx_label = onnx_session.get_outputs()[0].name
+        print("✅ Fertilizer ONNX session loaded, using ONNX Runtime for inference")
+except Exception as e:
+    print("⚠️ ONNX fertilizer model unavailable, using joblib pipeline:", e)
+    onnx_session = None
+
 # Schema for input
 class FertilizerFeatures(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     Temperature: float
     Humidity: float
     Moisture: float
@@ -30,35 +60,53 @@ class FertilizerFeatures(BaseModel):
     Phosphorous: float
     Potassium: float
 
-# Dependency to get current authenticated user
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    email = payload.get("email")
-    user = users_collection.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    
-    return user
+MAX_BATCH = 64
+
+# Row-major float64 batch matrix reused across batches; safe because the
+# batcher runs one batch at a time. The pipeline's StandardScaler must see
+# float64 as in training (XGBoost narrows to float32 only after it); float32
+# input flips rows that sit near a split threshold
+_batch_buffer = np.empty((MAX_BATCH, 8), dtype=np.float64)
+
+def _predict_batch(rows: list) -> list:
+    batch = _batch_buffer[:len(rows)]
+    batch[:] = rows
+    if onnx_session is not None:
+        # The exported graph takes float32 input
+        preds = onnx_session.run([onnx_label], {onnx_input: batch.astype(np.float32)})[0]
+    else:
+        preds = xgb_model.predict(batch)
+    labels = np.asarray(preds, dtype=np.int64).ravel()
+    unknown = len(FERT_NAMES) - 1
+    labels = np.where((labels >= 0) & (labels < unknown), labels, unknown)
+    return FERT_NAMES[labels].tolist()
+
+# Concurrent requests are stacked into one XGBoost predict call
+fertilizer_batcher = MicroBatcher(_predict_batch, max_batch_size=MAX_BATCH, max_latency_ms=5)
+
+def warmup() -> None:
+    """Run one dummy prediction so first-call initialisation happens at startup"""
+    if xgb_model is None and onnx_session is None:
+        return
+    _predict_batch([(0.0,) * 8])
+
+# Duplicate submissions of the same inputs wait on one prediction
+_prediction_flight = SingleFlight()
 
 # Secure prediction route
 @router.post("/predict")
-def predict_fertilizer(features: FertilizerFeatures, current_user: dict = Depends(get_current_user)):
-    if xgb_model is None:
+async def predict_fertilizer(features: FertilizerFeatures, current_user: AuthUser = Depends(get_current_user)):
+    if xgb_model is None and onnx_session is None:
         raise HTTPException(status_code=500, detail="Model not loaded")
 
     try:
-        data = np.array([[features.Temperature, features.Humidity, features.Moisture,
-                          features.SoilType, features.CropType, features.Nitrogen,
-                          features.Phosphorous, features.Potassium]])
-        pred = xgb_model.predict(data)[0]
-        fertilizer_name = fert_dict.get(pred, "Unknown")
+        row = (features.Temperature, features.Humidity, features.Moisture,
+               features.SoilType, features.CropType, features.Nitrogen,
+               features.Phosphorous, features.Potassium)
+        fertilizer_name = await _prediction_flight.do(row, lambda: fertilizer_batcher.submit(row))
         return {
             "recommended_fertilizer": fertilizer_name,
-            "farmer_email": current_user["email"]
+            "farmer_email": current_user.email
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,25 +1,51 @@
 """
 RAG API routes for Krishi Mitra
 """
+import asyncio
+import hashlib
+import time
 from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import JSONResponse
+import orjson
+from cachetools import TTLCache
+from fastapi import APIRouter, BackgroundTasks, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 
 from schemas.rag import (
-    QueryRequest, QueryResponse, EmbedRequest, EmbedResponse,
+    QueryRequest, QueryResponse, SourcesResponse, EmbedRequest, EmbedResponse,
+    BatchQueryRequest, BatchEmbedRequest, BatchEmbedResponse,
     HealthResponse, GraphVisualization, ErrorResponse
 )
 from services.langgraph_pipeline import rag_pipeline
 from services.embeddings import embedding_service
-from services.retrieval import retrieval_service
+from services.retrieval import get_retrieval_service
 from services.generation import generation_service
+from core.config import get_settings
 from core.logging import get_logger
 
 logger = get_logger(__name__)
+settings = get_settings()
 
 router = APIRouter()
 
+# Exact-match cache of full answers for repeated questions
+_answer_cache = TTLCache(maxsize=settings.answer_cache_size, ttl=settings.answer_cache_ttl)
+
+
+def _answer_cache_key(query: str, top_k: int, filters: Optional[dict]) -> str:
+    """Hash of the whitespace-normalized query plus retrieval parameters"""
+    normalized = " ".join(query.split())
+    filters_json = orjson.dumps(filters, option=orjson.OPT_SORT_KEYS) if filters else b""
+    payload = b"\0".join([normalized.encode(), str(top_k).encode(), filters_json])
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _sse(event: dict) -> bytes:
+    """Frame one event as a Server-Sent Events data line"""
+    return b"data: " + orjson.dumps(event) + b"\n\n"
+
 
 @router.post("/query", response_model=QueryResponse)
 async def query_endpoint(request: QueryRequest):
@@ -32,12 +58,24 @@ async def query_endpoint(request: QueryRequest):
     3. GenerateNode: Generates answer using Gemini LLM
     """
     try:
+        start_time = time.perf_counter()
+        top_k = request.top_k or 5
+        
+        cache_key = _answer_cache_key(request.query, top_k, request.filters)
+        cached = _answer_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Answer cache hit")
+            # Cached payloads were validated when stored
+            return ORJSONResponse(
+                {**cached, "latency_ms": int((time.perf_counter() - start_time) * 1000), "node_latencies": None}
+            )
+        
         logger.info(f"Processing query via LangGraph: {request.query[:100]}...")
         
         # Execute LangGraph pipeline
-        result = rag_pipeline.run(
+        result = await rag_pipeline.arun(
             query=request.query,
-            top_k=request.top_k or 5,
+            top_k=top_k,
             filters=request.filters
         )
         
@@ -50,8 +88,13 @@ async def query_endpoint(request: QueryRequest):
             node_latencies=result.get("node_latencies")
         )
         
+        payload = response.model_dump()
+        _answer_cache[cache_key] = payload
+        
         logger.info(f"Query processed successfully in {result['latency_ms']}ms")
-        return response
+        # Validated once above; returning a Response skips FastAPI's second
+        # response_model validation pass over every SourceInfo
+        return ORJSONResponse(payload)
         
     except Exception as e:
         logger.error(f"Error processing query: {e}")
@@ -61,6 +104,95 @@ async def query_endpoint(request: QueryRequest):
         )
 
 
+@router.post("/prefetch", status_code=status.HTTP_202_ACCEPTED)
+async def prefetch_endpoint(request: QueryRequest, background_tasks: BackgroundTasks):
+    """
+    Speculatively embed and retrieve a query the user is still typing
+    
+    Returns immediately; the work runs after the response is sent, so a
+    following /query for the same text skips straight to generation.
+    """
+    top_k = request.top_k or 5
+    if _answer_cache.get(_answer_cache_key(request.query, top_k, request.filters)) is None:
+        background_tasks.add_task(rag_pipeline.prefetch, request.query, top_k, request.filters)
+    return {"status": "accepted"}
+
+
+@router.post("/query/stream")
+async def query_stream_endpoint(request: QueryRequest):
+    """
+    Streaming variant of /query as Server-Sent Events
+    
+    Each event is a JSON object: a "sources" event is sent as soon as
+    retrieval finishes, "token" events carry answer text as Gemini produces
+    it, and a final "done" event carries the full answer, sources, retrieved
+    chunks and latencies (the same fields as QueryResponse, with ttft_ms
+    added to node_latencies).
+    Failures after the stream has started are reported as an "error" event.
+    """
+    top_k = request.top_k or 5
+    cache_key = _answer_cache_key(request.query, top_k, request.filters)
+    
+    async def events():
+        cached = _answer_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Answer cache hit")
+            yield _sse({"type": "sources", "sources": cached["sources"]})
+            yield _sse({"type": "token", "text": cached["answer"]})
+            yield _sse({"type": "done", **cached, "node_latencies": None})
+            return
+        
+        try:
+            async for event in rag_pipeline.astream(
+                query=request.query,
+                top_k=top_k,
+                filters=request.filters
+            ):
+                if event["type"] == "done":
+                    response = QueryResponse(**{k: v for k, v in event.items() if k != "type"})
+                    _answer_cache[cache_key] = response.model_dump()
+                yield _sse(event)
+        except Exception as e:
+            logger.error(f"Error streaming query: {e}")
+            yield _sse({"type": "error", "detail": f"Error processing query: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/sources", response_model=SourcesResponse)
+async def sources_endpoint(request: QueryRequest):
+    """
+    Citations for a question without generating an answer
+    
+    Runs only embed + retrieve and skips building the chunk payloads.
+    """
+    try:
+        start_time = time.perf_counter()
+        
+        embedding, _ = await run_in_threadpool(embedding_service.embed_query, request.query)
+        results, _ = await run_in_threadpool(
+            lambda: get_retrieval_service().retrieve_chunks(
+                embedding, request.top_k or 5, request.filters, project="sources"
+            )
+        )
+        
+        return ORJSONResponse({
+            "sources": results["sources"],
+            "latency_ms": int((time.perf_counter() - start_time) * 1000)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error retrieving sources: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving sources: {str(e)}"
+        )
+
+
 @router.post("/embed", response_model=EmbedResponse)
 async def embed_endpoint(request: EmbedRequest):
     """
@@ -68,10 +200,10 @@ async def embed_endpoint(request: EmbedRequest):
     """
     try:
         # Generate embeddings
-        embeddings, processing_time_ms = embedding_service.embed_query(request.text)
+        embeddings, processing_time_ms = await run_in_threadpool(embedding_service.embed_query, request.text)
         
         response = EmbedResponse(
-            embeddings=embeddings,
+            embeddings=embeddings.tolist(),
             dimension=len(embeddings),
             processing_time_ms=processing_time_ms
         )
@@ -87,6 +219,85 @@ async def embed_endpoint(request: EmbedRequest):
         )
 
 
+@router.post("/query/batch", response_model=List[QueryResponse])
+async def query_batch_endpoint(request: BatchQueryRequest):
+    """
+    Answer several queries in one request
+    
+    Uncached queries are embedded together in one model forward pass;
+    retrieval and generation then run concurrently per query (their embed
+    step hits the embedding cache). Responses are returned in input order.
+    """
+    try:
+        start_time = time.perf_counter()
+        top_k = request.top_k or 5
+        
+        keys = [_answer_cache_key(query, top_k, request.filters) for query in request.queries]
+        responses: List[Optional[QueryResponse]] = [None] * len(keys)
+        pending = []
+        for i, key in enumerate(keys):
+            cached = _answer_cache.get(key)
+            if cached is not None:
+                responses[i] = QueryResponse(
+                    **{**cached, "latency_ms": int((time.perf_counter() - start_time) * 1000), "node_latencies": None}
+                )
+            else:
+                pending.append(i)
+        
+        if pending:
+            logger.info(f"Processing batch of {len(pending)} queries via LangGraph")
+            await run_in_threadpool(
+                embedding_service.embed_queries, [request.queries[i] for i in pending]
+            )
+            results = await asyncio.gather(*(
+                rag_pipeline.arun(request.queries[i], top_k, request.filters)
+                for i in pending
+            ))
+            for i, result in zip(pending, results):
+                responses[i] = QueryResponse(
+                    answer=result["answer"],
+                    sources=result["sources"],
+                    retrieved_chunks=result["retrieved_chunks"],
+                    latency_ms=result["latency_ms"],
+                    node_latencies=result.get("node_latencies")
+                )
+                _answer_cache[keys[i]] = responses[i].model_dump()
+        
+        return responses
+        
+    except Exception as e:
+        logger.error(f"Error processing query batch: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing query batch: {str(e)}"
+        )
+
+
+@router.post("/embed/batch", response_model=BatchEmbedResponse)
+async def embed_batch_endpoint(request: BatchEmbedRequest):
+    """
+    Generate embeddings for several texts in one model forward pass
+    """
+    try:
+        embeddings, processing_time_ms = await run_in_threadpool(
+            embedding_service.embed_queries, request.texts
+        )
+        
+        logger.info(f"Generated {len(embeddings)} embeddings in {processing_time_ms}ms")
+        return BatchEmbedResponse(
+            embeddings=[embedding.tolist() for embedding in embeddings],
+            dimension=len(embeddings[0]),
+            processing_time_ms=processing_time_ms
+        )
+        
+    except Exception as e:
+        logger.error(f"Error generating batch embeddings: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating embeddings: {str(e)}"
+        )
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_endpoint():
     """
@@ -101,7 +312,7 @@ async def health_endpoint():
         timestamp = datetime.utcnow().isoformat()
         
         # Check Pinecone connection
-        retrieval_health = await retrieval_service.health_check()
+        retrieval_health = await get_retrieval_service().health_check()
         pinecone_status = retrieval_health.get("status", "unknown")
         
         # Check LangGraph pipeline
@@ -121,15 +332,16 @@ async def health_endpoint():
             timestamp=timestamp,
             details={
                 "retrieval": retrieval_health,
+                "embedding_cache": embedding_service.cache_stats(),
                 "pipeline": pipeline_health,
                 "generation": generation_health
             }
         )
         
         if overall_status != "ok":
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                content=response.dict()
+                content=response.model_dump()
             )
         
         return response
@@ -141,10 +353,28 @@ async def health_endpoint():
             detail=str(e),
             timestamp=datetime.utcnow().isoformat()
         )
-        return JSONResponse(
+        return ORJSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content=error_response.model_dump()
+        )
+
+
+@router.get("/ready")
+async def ready_endpoint():
+    """
+    Readiness probe: 503 until the pipeline has warmed up at startup, so a
+    load balancer does not route queries to a cold worker
+    """
+    if not rag_pipeline.warm:
+        return ORJSONResponse(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            content=error_response.dict()
+            content={"warm": False}
         )
+    return {"warm": True}
+
+
+# The graph is fixed once compiled, so its JSON is encoded on first request
+_graph_payload: Optional[bytes] = None
 
 
 @router.get("/graph/visualize", response_model=GraphVisualization)
@@ -155,18 +385,21 @@ async def visualize_graph_endpoint():
     Returns the nodes and edges of the RAG pipeline for debugging
     and visualization purposes.
     """
+    global _graph_payload
     try:
-        graph_structure = rag_pipeline.get_graph_structure()
-        
-        response = GraphVisualization(
-            nodes=graph_structure["nodes"],
-            edges=graph_structure["edges"],
-            entry_point=graph_structure["entry_point"],
-            description=graph_structure["description"]
-        )
+        if _graph_payload is None:
+            graph_structure = rag_pipeline.get_graph_structure()
+            
+            response = GraphVisualization(
+                nodes=graph_structure["nodes"],
+                edges=graph_structure["edges"],
+                entry_point=graph_structure["entry_point"],
+                description=graph_structure["description"]
+            )
+            _graph_payload = orjson.dumps(response.model_dump())
         
         logger.info("Graph structure retrieved successfully")
-        return response
+        return Response(content=_graph_payload, media_type="application/json")
         
     except Exception as e:
         logger.error(f"Error getting graph structure: {e}")
@@ -1,29 +1,54 @@
+from typing import List, Optional
+
 from fastapi import APIRouter, HTTPException, Depends, Query, Request
-from routers.auth import get_current_user
-from services.weather import get_weather_by_location, get_weather, generate_farm_alerts
+from pydantic import BaseModel, ConfigDict, Field
+from core.auth_deps import AuthUser, get_current_user
+from core.auth_cache import get_user_cached
+from services.weather import (
+    get_weather_by_location, get_weather, get_weather_many, generate_farm_alerts, weather_cache_stats
+)
 from core.security import decode_access_token
-from db import users_collection
 
 router = APIRouter()
 
+async def maybe_enrich_farm_data(request: Request, farm_data: dict) -> None:
+    """Fill primary_crops/crop_type from the caller's profile if a valid bearer token is sent"""
+    auth = request.headers.get("authorization")
+    if not auth or not auth.lower().startswith("bearer "):
+        return
+    token = auth.split(" ", 1)[1]
+    try:
+        payload = decode_access_token(token)
+        email = payload.get("email") if isinstance(payload, dict) else None
+        if email:
+            user = await get_user_cached(email)
+            if user and isinstance(user.get("primary_crops"), list):
+                farm_data["primary_crops"] = user["primary_crops"]
+                # prefer first user crop as crop_type if provided
+                if user["primary_crops"]:
+                    farm_data["crop_type"] = user["primary_crops"][0]
+    except Exception:
+        # ignore token errors; endpoint remains public
+        pass
+
 @router.get("/weather")
-def get_weather_for_user(current_user: dict = Depends(get_current_user)):
+async def get_weather_for_user(current_user: AuthUser = Depends(get_current_user)):
     """Get weather for user's registered location with farm alerts"""
-    city = current_user.get("village")  # Using village as default city
-    state = current_user.get("state")
+    city = current_user.village  # Using village as default city
+    state = current_user.state
     
     if not city:
         raise HTTPException(status_code=400, detail="Location not set for user")
     
     try:
-        weather = get_weather_by_location(city, state)
+        weather = await get_weather_by_location(city, state)
         
         # Create farm data from user profile
         farm_data = {
             "soil_moisture": 50,  # Default value, could be from user profile
-            "crop_type": current_user.get("primary_crops", ["generic"])[0] if current_user.get("primary_crops") else "generic",
-            "primary_crops": current_user.get("primary_crops", []),  # pass full list for rules
-            "farm_size": current_user.get("farm_size", "medium"),
+            "crop_type": current_user.primary_crops[0] if current_user.primary_crops else "generic",
+            "primary_crops": current_user.primary_crops,  # pass full list for rules
+            "farm_size": current_user.farm_size or "medium",
             "recent_rainfall": 0  # Default value, could be from weather history
         }
         
@@ -39,7 +64,7 @@ def get_weather_for_user(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/weather/current")
-def get_weather_by_city(
+async def get_weather_by_city(
     request: Request,
     city: str = Query(..., min_length=2, max_length=100, description="City name for weather info"),
     state: str = Query(None, min_length=2, max_length=100, description="State name (optional)"),
@@ -49,7 +74,7 @@ def get_weather_by_city(
 ):
     """Get weather for any specific location with farm alerts using real rainfall data"""
     try:
-        weather = get_weather(city, state, country)
+        weather = await get_weather(city, state, country)
         
         # Create farm data from query parameters (rainfall data comes from weather API)
         farm_data = {
@@ -59,23 +84,7 @@ def get_weather_by_city(
             "farm_size": "medium",  # Default value
         }
 
-        # If an Authorization header is present, try to include user's primary_crops
-        auth = request.headers.get("authorization") or request.headers.get("Authorization")
-        if auth and auth.lower().startswith("bearer "):
-            token = auth.split(" ", 1)[1]
-            try:
-                payload = decode_access_token(token)
-                email = payload.get("email") if isinstance(payload, dict) else None
-                if email:
-                    user = users_collection.find_one({"email": email})
-                    if user and isinstance(user.get("primary_crops"), list):
-                        farm_data["primary_crops"] = user["primary_crops"]
-                        # prefer first user crop as crop_type if provided
-                        if user["primary_crops"]:
-                            farm_data["crop_type"] = user["primary_crops"][0]
-            except Exception:
-                # ignore token errors; endpoint remains public
-                pass
+        await maybe_enrich_farm_data(request, farm_data)
         
         alerts = generate_farm_alerts(weather, farm_data)
         
@@ -86,3 +95,32 @@ def get_weather_by_city(
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+class Location(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    city: str = Field(..., min_length=2, max_length=100)
+    state: Optional[str] = Field(None, min_length=2, max_length=100)
+    country: str = Field("IN", min_length=2, max_length=2)
+
+class BatchWeatherRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    locations: List[Location] = Field(..., min_length=1, max_length=50)
+
+@router.post("/weather/batch")
+async def get_weather_batch(request: BatchWeatherRequest):
+    """Current weather for several locations (e.g. a dashboard of plots), fetched concurrently"""
+    results = await get_weather_many([(loc.city, loc.state, loc.country) for loc in request.locations])
+    return [
+        {
+            "location": loc.model_dump(),
+            **({"error": str(result)} if isinstance(result, Exception) else {"weather": result})
+        }
+        for loc, result in zip(request.locations, results)
+    ]
+
+@router.get("/weather/cache/stats")
+def get_weather_cache_stats():
+    """Hit-rate statistics for the weather response cache"""
+    return weather_cache_stats()
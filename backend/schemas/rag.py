@@ -2,11 +2,13 @@
 Pydantic schemas for RAG API requests and responses
 """
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class QueryRequest(BaseModel):
     """Request model for query endpoint"""
+    model_config = ConfigDict(frozen=True)
+
     query: str = Field(..., description="The user's question", min_length=1, max_length=1000)
     top_k: Optional[int] = Field(5, description="Number of chunks to retrieve", ge=1, le=20)
     filters: Optional[Dict[str, Any]] = Field(None, description="Optional metadata filters")
@@ -29,8 +31,16 @@ class QueryResponse(BaseModel):
     node_latencies: Optional[Dict[str, float]] = Field(None, description="Individual node latencies")
 
 
+class SourcesResponse(BaseModel):
+    """Response model for the citation-only sources endpoint"""
+    sources: List[SourceInfo] = Field(..., description="Source information")
+    latency_ms: int = Field(..., description="Total response time in milliseconds")
+
+
 class EmbedRequest(BaseModel):
     """Request model for embed endpoint"""
+    model_config = ConfigDict(frozen=True)
+
     text: str = Field(..., description="Text to embed", min_length=1, max_length=5000)
 
 
@@ -41,6 +51,29 @@ class EmbedResponse(BaseModel):
     processing_time_ms: float = Field(..., description="Time taken to generate embeddings")
 
 
+class BatchQueryRequest(BaseModel):
+    """Request model for batch query endpoint"""
+    model_config = ConfigDict(frozen=True)
+
+    queries: List[str] = Field(..., description="Questions to answer", min_length=1, max_length=64)
+    top_k: Optional[int] = Field(5, description="Number of chunks to retrieve per query", ge=1, le=20)
+    filters: Optional[Dict[str, Any]] = Field(None, description="Optional metadata filters applied to every query")
+
+
+class BatchEmbedRequest(BaseModel):
+    """Request model for batch embed endpoint"""
+    model_config = ConfigDict(frozen=True)
+
+    texts: List[str] = Field(..., description="Texts to embed", min_length=1, max_length=64)
+
+
+class BatchEmbedResponse(BaseModel):
+    """Response model for batch embed endpoint"""
+    embeddings: List[List[float]] = Field(..., description="One embedding per input text, in order")
+    dimension: int = Field(..., description="Embedding dimension")
+    processing_time_ms: float = Field(..., description="Time taken to generate embeddings")
+
+
 class HealthResponse(BaseModel):
     """Response model for health check"""
     status: str = Field(..., description="Overall status")
@@ -0,0 +1,166 @@
+"""
+Micro-batching of concurrent inference requests
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, List, Optional
+
+
+def _check_result_count(results: List[Any], items: List[Any]) -> None:
+    """Fail the whole batch if batch_fn broke the one-result-per-item contract."""
+    if len(results) != len(items):
+        raise ValueError(f"batch_fn returned {len(results)} results for {len(items)} items")
+
+
+class MicroBatcher:
+    """
+    Coalesces items submitted concurrently into one batched call.
+
+    Items arriving within ``max_latency_ms`` of the first queued item (up to
+    ``max_batch_size``) are handed to ``batch_fn`` together. ``batch_fn`` runs
+    on ``executor`` and must return one result per input, in order.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 16,
+        max_latency_ms: float = 10.0,
+        executor: Optional[Executor] = None
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self.executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_worker(self) -> None:
+        """Start the worker task on the running loop if it is not alive."""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result from the next batch."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def stop(self) -> None:
+        """Cancel the worker task and any items still waiting in the queue."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_latency
+
+            # Collect more items until the batch is full or the window closes
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.batch_fn, items)
+                _check_result_count(results, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class ThreadedMicroBatcher:
+    """
+    MicroBatcher for synchronous callers running on worker threads.
+
+    ``submit`` blocks the calling thread until the batch containing its item
+    has been processed by ``batch_fn`` on the batcher's own daemon thread.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 16,
+        max_latency_ms: float = 5.0,
+        name: str = "micro-batcher"
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self.name = name
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    def _ensure_worker(self) -> None:
+        """Start the worker thread on first use (and after a fork)."""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def submit(self, item: Any) -> Any:
+        """Queue one item and block until its result from the next batch."""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_latency
+
+            # Collect more items until the batch is full or the window closes
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                _check_result_count(results, items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -1,27 +1,68 @@
-import tensorflow as tf
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing import image as keras_image
+# TensorFlow is imported lazily (on model load) so importing this module,
+# and the router that uses it, stays cheap
 import numpy as np
 import os
-from typing import Optional, Dict, Any
+import threading
+from typing import Optional, Dict, Any, BinaryIO, List, Union
 from PIL import Image
 import io
-import base64
+
+_INV_255 = np.float32(1.0 / 255.0)
+
+def _prefetch(path: str) -> None:
+    """Ask the kernel to start reading a model file into the page cache"""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+def _to_model_input(image: Image.Image) -> np.ndarray:
+    """RGB, resize to 128x128 as a (1, 128, 128, 3) uint8 batch (scaling happens in the model graph)"""
+    # For JPEGs, have libjpeg decode at the smallest 1/2, 1/4 or 1/8 scale
+    # that still covers 128x128; phone photos are decoded at a fraction of
+    # full resolution (no-op for other formats)
+    image.draft('RGB', (128, 128))
+    
+    # Convert to RGB if needed
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    # Resize to model input size
+    image = image.resize((128, 128))
+    
+    return np.asarray(image, dtype=np.uint8)[np.newaxis]
 
 class CropDiseaseDetector:
     """
     Crop Disease Detection Service using TensorFlow model
     """
     
-    def __init__(self, model_path: str = "models/trained_model.keras"):
+    def __init__(self, model_path: str = "models/trained_model.keras", onnx_path: Optional[str] = None):
         """
         Initialize the crop disease detector
         
         Args:
             model_path: Path to the trained model file
+            onnx_path: Path to an ONNX export of the same model (see
+                export_disease_onnx.py); defaults to model_path with .onnx
         """
         self.model_path = model_path
+        self.onnx_path = onnx_path or os.path.splitext(model_path)[0] + ".onnx"
+        # INT8-quantized variant (see quantize_disease_onnx.py), preferred when present
+        self.int8_path = os.path.splitext(self.onnx_path)[0] + ".int8.onnx"
+        self.session_path: Optional[str] = None
         self.model = None
+        self._infer = None
+        self.session = None
+        self.input_name: Optional[str] = None
+        # Older ONNX exports take [0, 1] float32 input instead of raw uint8
+        self._session_takes_float = False
         self.class_names = [
             'Apple___Apple_scab',
             'Apple___Black_rot',
@@ -62,50 +103,186 @@ class CropDiseaseDetector:
             'Tomato___Tomato_mosaic_virus',
             'Tomato___healthy'
         ]
+        self._class_names_arr = np.asarray(self.class_names)
+        # Per-class display fields, indexed by the model's output position
+        self._crops: List[str] = []
+        self._diseases: List[str] = []
+        for class_name in self.class_names:
+            parts = class_name.split('___')
+            self._crops.append(parts[0].replace('_', ' '))
+            self._diseases.append(parts[1].replace('_', ' ') if len(parts) > 1 else 'Unknown')
+        self._is_healthy: List[bool] = ['healthy' in d.lower() for d in self._diseases]
+        # Static response payloads, built on first use
+        self._supported_crops: Optional[Dict[str, Any]] = None
+        self._model_info: Optional[Dict[str, Any]] = None
         self.load_model()
     
+    @property
+    def is_loaded(self) -> bool:
+        """Whether either inference backend is available"""
+        return self.session is not None or self.model is not None
+    
+    def _onnx_is_current(self, path: str) -> bool:
+        """True if the ONNX export exists and is not older than the Keras model"""
+        if not os.path.exists(path):
+            return False
+        if not os.path.exists(self.model_path):
+            return True
+        return os.path.getmtime(path) >= os.path.getmtime(self.model_path)
+    
+    def _load_onnx_session(self, path: str) -> None:
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        available = ort.get_available_providers()
+        providers = [p for p in ("CUDAExecutionProvider", "CPUExecutionProvider") if p in available]
+        self.session = ort.InferenceSession(path, sess_options=options, providers=providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self._session_takes_float = model_input.type == 'tensor(float)'
+        self.session_path = path
+    
+    def _run_model(self, batch: np.ndarray) -> np.ndarray:
+        """Forward pass over a (N, 128, 128, 3) uint8 batch, returning class probabilities"""
+        if self.session is not None:
+            if self._session_takes_float:
+                batch = np.multiply(batch, _INV_255, dtype=np.float32)
+            return self.session.run(None, {self.input_name: batch})[0]
+        return self._infer(batch).numpy()
+    
     def load_model(self) -> None:
-        """Load the trained TensorFlow model"""
+        """Load the model, preferring an up-to-date ONNX export over Keras"""
+        self._model_info = None
+        self.model = None
+        self._infer = None
+        self.session = None
+        self.session_path = None
+        
+        # ONNX Runtime avoids importing TensorFlow at all
+        for path in (self.int8_path, self.onnx_path):
+            if not self._onnx_is_current(path):
+                continue
+            try:
+                _prefetch(path)
+                self._load_onnx_session(path)
+                print(f"ONNX model loaded successfully from {path}")
+                break
+            except Exception as e:
+                self.session = None
+                print(f"ONNX model {path} unavailable: {str(e)}")
+        
+        if self.session is None:
+            try:
+                if os.path.exists(self.model_path):
+                    # Overlap the weights read with the TensorFlow import
+                    _prefetch(self.model_path)
+                    import tensorflow as tf
+                    self.model = tf.keras.models.load_model(self.model_path)
+                    # One traced graph for every batch size; skips predict()'s
+                    # per-call data pipeline setup. Takes uint8 pixels and
+                    # scales inside the graph, fused with the first layer
+                    model = self.model
+                    self._infer = tf.function(
+                        lambda x: model(tf.cast(x, tf.float32) * (1.0 / 255.0), training=False),
+                        input_signature=[tf.TensorSpec([None, 128, 128, 3], tf.uint8)]
+                    )
+                    print(f"Model loaded successfully from {self.model_path}")
+                else:
+                    raise FileNotFoundError(f"Model file not found at {self.model_path}")
+            except Exception as e:
+                print(f"Error loading model: {str(e)}")
+                # Set model to None so the service can still start
+                self.model = None
+                self._infer = None
+                print("Model loading failed. Service will start without model functionality.")
+                # Don't raise the exception to allow the service to start
+                return
+        
+        # Pay graph tracing / kernel selection now rather than on the first request
         try:
-            if os.path.exists(self.model_path):
-                self.model = load_model(self.model_path)
-                print(f"Model loaded successfully from {self.model_path}")
-            else:
-                raise FileNotFoundError(f"Model file not found at {self.model_path}")
+            self._run_model(np.zeros((1, 128, 128, 3), dtype=np.uint8))
         except Exception as e:
-            print(f"Error loading model: {str(e)}")
-            # Set model to None so the service can still start
-            self.model = None
-            print("Model loading failed. Service will start without model functionality.")
-            # Don't raise the exception to allow the service to start
+            print(f"Model warm-up failed: {str(e)}")
+    
+    def get_supported_crops(self) -> Dict[str, Any]:
+        """
+        Get supported crops and their diseases (computed once per instance)
+        
+        Returns:
+            Supported crops, diseases grouped by crop and all class names
+        """
+        if self._supported_crops is None:
+            crops = set()
+            diseases_by_crop = {}
+            
+            for crop, disease in zip(self._crops, self._diseases):
+                crops.add(crop)
+                diseases_by_crop.setdefault(crop, []).append(disease)
+            
+            self._supported_crops = {
+                'supported_crops': sorted(crops),
+                'diseases_by_crop': diseases_by_crop,
+                'total_classes': len(self.class_names),
+                'all_classes': self.class_names
+            }
+        return self._supported_crops
+    
+    def get_model_info(self) -> Dict[str, Any]:
+        """
+        Get information about the loaded model (computed once per load)
+        
+        Returns:
+            Model information and status
+        """
+        if self._model_info is None:
+            model_loaded = self.is_loaded
+            
+            model_info = {
+                'model_loaded': model_loaded,
+                'model_path': self.session_path or self.model_path,
+                'backend': 'onnx' if self.session is not None else 'keras' if self.model is not None else None,
+                'total_classes': len(self.class_names),
+                'input_shape': [128, 128, 3] if model_loaded else None,
+            }
+            
+            if self.session is not None:
+                model_info['model_summary'] = {
+                    'input_shape': self.session.get_inputs()[0].shape,
+                    'output_shape': self.session.get_outputs()[0].shape,
+                    'providers': self.session.get_providers()
+                }
+            elif model_loaded:
+                try:
+                    model_info['model_summary'] = {
+                        'input_shape': self.model.input_shape,
+                        'output_shape': self.model.output_shape,
+                        'total_params': self.model.count_params()
+                    }
+                except Exception as e:
+                    model_info['model_summary_error'] = str(e)
+            
+            self._model_info = model_info
+        return self._model_info
     
-    def preprocess_image(self, image_data: bytes) -> np.ndarray:
+    def preprocess_image(self, image_data: Union[bytes, BinaryIO]) -> np.ndarray:
         """
         Preprocess image for model prediction
         
         Args:
-            image_data: Raw image bytes
+            image_data: Raw image bytes or a readable binary file object
             
         Returns:
             Preprocessed image array
         """
         try:
-            # Convert bytes to PIL Image
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Convert to RGB if needed
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Resize to model input size
-            image = image.resize((128, 128))
-            
-            # Convert to array and normalize
-            input_arr = keras_image.img_to_array(image)
-            input_arr = np.array([input_arr])  # Convert single image to batch
-            input_arr = input_arr / 255.0  # Normalize pixel values
+            # Open with PIL; file objects are read incrementally, not copied
+            if isinstance(image_data, (bytes, bytearray)):
+                image = Image.open(io.BytesIO(image_data))
+            else:
+                image_data.seek(0)
+                image = Image.open(image_data)
             
-            return input_arr
+            return _to_model_input(image)
             
         except Exception as e:
             raise ValueError(f"Error preprocessing image: {str(e)}")
@@ -121,25 +298,22 @@ class CropDiseaseDetector:
             Preprocessed image array
         """
         try:
-            img = keras_image.load_img(image_path, target_size=(128, 128))
-            input_arr = keras_image.img_to_array(img)
-            input_arr = np.array([input_arr])  # Convert single image to batch
-            input_arr = input_arr / 255.0  # Normalize pixel values
-            return input_arr
+            with Image.open(image_path) as image:
+                return _to_model_input(image)
         except Exception as e:
             raise ValueError(f"Error preprocessing image from path: {str(e)}")
     
-    def predict_disease(self, image_data: bytes) -> Dict[str, Any]:
+    def predict_disease(self, image_data: Union[bytes, BinaryIO]) -> Dict[str, Any]:
         """
         Predict crop disease from image data
         
         Args:
-            image_data: Raw image bytes
+            image_data: Raw image bytes or a readable binary file object
             
         Returns:
             Dictionary containing prediction results
         """
-        if self.model is None:
+        if not self.is_loaded:
             return {
                 'success': False,
                 'error': 'Model not loaded. Please check model file and compatibility.',
@@ -151,40 +325,9 @@ class CropDiseaseDetector:
             processed_image = self.preprocess_image(image_data)
             
             # Make prediction
-            predictions = self.model.predict(processed_image)
-            
-            # Get prediction results
-            result_index = np.argmax(predictions)
-            confidence = float(np.max(predictions))
-            predicted_class = self.class_names[result_index]
-            
-            # Extract crop and disease information
-            crop_disease_parts = predicted_class.split('___')
-            crop = crop_disease_parts[0].replace('_', ' ')
-            disease = crop_disease_parts[1].replace('_', ' ') if len(crop_disease_parts) > 1 else 'Unknown'
+            predictions = self._run_model(processed_image)
             
-            # Determine if healthy or diseased
-            is_healthy = 'healthy' in disease.lower()
-            
-            return {
-                'success': True,
-                'prediction': {
-                    'class': predicted_class,
-                    'crop': crop,
-                    'disease': disease,
-                    'is_healthy': is_healthy,
-                    'confidence': confidence,
-                    'confidence_percentage': round(confidence * 100, 2)
-                },
-                'all_predictions': [
-                    {
-                        'class': self.class_names[i],
-                        'confidence': float(predictions[0][i]),
-                        'confidence_percentage': round(float(predictions[0][i]) * 100, 2)
-                    }
-                    for i in range(len(self.class_names))
-                ]
-            }
+            return self.build_result(predictions[0])
             
         except Exception as e:
             return {
@@ -193,6 +336,62 @@ class CropDiseaseDetector:
                 'prediction': None
             }
     
+    def predict_batch(self, images: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Run one model call over several preprocessed images
+        
+        Args:
+            images: Preprocessed uint8 arrays of shape (1, 128, 128, 3)
+            
+        Returns:
+            Class probability vector for each input, in order
+        """
+        batch = np.concatenate(images, axis=0)
+        predictions = self._run_model(batch)
+        return list(predictions)
+    
+    def build_result(self, probabilities: np.ndarray, top_k: Optional[int] = 5) -> Dict[str, Any]:
+        """
+        Build the prediction response from one class probability vector
+        
+        Args:
+            probabilities: Model output for a single image
+            top_k: Number of highest-confidence classes to list in
+                all_predictions (None for every class, 0 to omit the field)
+            
+        Returns:
+            Dictionary containing prediction results
+        """
+        # Get prediction results
+        result_index = int(np.argmax(probabilities))
+        confidence = float(probabilities[result_index])
+        
+        result = {
+            'success': True,
+            'prediction': {
+                'class': self.class_names[result_index],
+                'crop': self._crops[result_index],
+                'disease': self._diseases[result_index],
+                'is_healthy': self._is_healthy[result_index],
+                'confidence': confidence,
+                'confidence_percentage': round(confidence * 100, 2)
+            }
+        }
+        
+        if top_k != 0:
+            # Ranked classes, highest confidence first
+            if top_k is None or top_k >= len(probabilities):
+                indices = np.argsort(-probabilities)
+            else:
+                indices = np.argpartition(-probabilities, top_k)[:top_k]
+                indices = indices[np.argsort(-probabilities[indices])]
+            result['all_predictions'] = [
+                {'class': name, 'confidence': score}
+                for name, score in zip(self._class_names_arr[indices].tolist(), probabilities[indices].tolist())
+            ]
+        
+        return result
+    
     def predict_from_path(self, image_path: str) -> Dict[str, Any]:
         """
         Predict crop disease from image file path
@@ -203,7 +402,7 @@ class CropDiseaseDetector:
         Returns:
             Dictionary containing prediction results
         """
-        if self.model is None:
+        if not self.is_loaded:
             return {
                 'success': False,
                 'error': 'Model not loaded. Please check model file and compatibility.',
@@ -215,32 +414,8 @@ class CropDiseaseDetector:
             processed_image = self.preprocess_image_from_path(image_path)
             
             # Make prediction
-            predictions = self.model.predict(processed_image)
-            
-            # Get prediction results
-            result_index = np.argmax(predictions)
-            confidence = float(np.max(predictions))
-            predicted_class = self.class_names[result_index]
-            
-            # Extract crop and disease information
-            crop_disease_parts = predicted_class.split('___')
-            crop = crop_disease_parts[0].replace('_', ' ')
-            disease = crop_disease_parts[1].replace('_', ' ') if len(crop_disease_parts) > 1 else 'Unknown'
-            
-            # Determine if healthy or diseased
-            is_healthy = 'healthy' in disease.lower()
-            
-            return {
-                'success': True,
-                'prediction': {
-                    'class': predicted_class,
-                    'crop': crop,
-                    'disease': disease,
-                    'is_healthy': is_healthy,
-                    'confidence': confidence,
-                    'confidence_percentage': round(confidence * 100, 2)
-                }
-            }
+            predictions = self._run_model(processed_image)
+            return self.build_result(predictions[0], top_k=0)
             
         except Exception as e:
             return {
@@ -260,7 +435,7 @@ def model_prediction(test_image: str) -> int:
     Returns:
         Index of the predicted class
     """
-    detector = CropDiseaseDetector()
+    detector = get_crop_disease_detector()
     result = detector.predict_from_path(test_image)
     
     if result['success']:
@@ -272,10 +447,14 @@ def model_prediction(test_image: str) -> int:
 
 # Initialize global detector instance (will be created when needed)
 crop_disease_detector = None
+_detector_lock = threading.Lock()
 
 def get_crop_disease_detector():
-    """Get or create the crop disease detector instance"""
+    """Get or create the crop disease detector instance (loads the model on first call)"""
     global crop_disease_detector
     if crop_disease_detector is None:
-        crop_disease_detector = CropDiseaseDetector()
+        # Concurrent first requests must not each load the model
+        with _detector_lock:
+            if crop_disease_detector is None:
+                crop_disease_detector = CropDiseaseDetector()
     return crop_disease_detector
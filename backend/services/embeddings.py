@@ -1,12 +1,18 @@
 """
 Embedding service for query vectorization
 """
+import hashlib
 import time
-from typing import List
+from threading import Lock
+from typing import Any, Dict, List
+
+import numpy as np
+from cachetools import TTLCache
 from sentence_transformers import SentenceTransformer
 
 from core.config import get_settings
 from core.logging import get_logger
+from services.batching import ThreadedMicroBatcher
 
 logger = get_logger(__name__)
 settings = get_settings()
@@ -17,19 +23,39 @@ class EmbeddingService:
     
     def __init__(self):
         self.model = None
+        # Exact-match cache: normalized query hash -> embedding vector
+        self._cache = TTLCache(maxsize=settings.embedding_cache_size, ttl=settings.embedding_cache_ttl)
+        self._cache_lock = Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        # Concurrent embed_query misses (from pipeline threads) share one encode() call
+        self._batcher = ThreadedMicroBatcher(
+            self._encode_batch,
+            max_batch_size=settings.embedding_batch_size,
+            max_latency_ms=settings.embedding_batch_window_ms,
+            name="embedding-batcher"
+        )
         self._initialize()
     
     def _initialize(self):
         """Initialize embedding model"""
         try:
-            logger.info(f"Loading embedding model: {settings.embedding_model_name}")
-            self.model = SentenceTransformer(settings.embedding_model_name)
+            logger.info(f"Loading embedding model: {settings.embedding_model_name} ({settings.embedding_backend})")
+            if settings.embedding_backend == "onnx":
+                # ONNX Runtime (optionally INT8-quantized) export of the same model;
+                # pooling and normalization stay in SentenceTransformer
+                model_kwargs = {"file_name": settings.embedding_onnx_file} if settings.embedding_onnx_file else None
+                self.model = SentenceTransformer(
+                    settings.embedding_model_name, backend="onnx", model_kwargs=model_kwargs
+                )
+            else:
+                self.model = SentenceTransformer(settings.embedding_model_name)
             logger.info(f"Embedding model loaded successfully. Dimension: {self.model.get_sentence_embedding_dimension()}")
         except Exception as e:
             logger.error(f"Failed to initialize embedding model: {e}")
             raise
     
-    def embed_query(self, query: str) -> tuple[List[float], float]:
+    def embed_query(self, query: str) -> tuple[np.ndarray, float]:
         """
         Generate embeddings for a query string
         
@@ -37,21 +63,37 @@ class EmbeddingService:
             query: Input query string
             
         Returns:
-            Tuple of (embedding vector, latency in ms)
+            Tuple of (read-only float32 embedding vector, latency in ms)
         """
         try:
-            start_time = time.time()
+            start_time = time.perf_counter()
+            
+            key = self._cache_key(query)
+            with self._cache_lock:
+                embedding_vector = self._cache.get(key)
+                cache_hit = embedding_vector is not None
+                if cache_hit:
+                    self._cache_hits += 1
+                else:
+                    self._cache_misses += 1
             
-            # Generate embeddings
-            embeddings = self.model.encode([query])
-            embedding_vector = embeddings[0].tolist()
+            if not cache_hit:
+                # Generate embeddings
+                embedding_vector = self._batcher.submit(query)
+                
+                with self._cache_lock:
+                    self._cache[key] = embedding_vector
             
-            latency_ms = (time.time() - start_time) * 1000
+            latency_ms = (time.perf_counter() - start_time) * 1000
             
             logger.log_node_execution(
                 node_name="EmbedNode",
                 latency_ms=latency_ms,
-                metadata={"query_length": len(query), "embedding_dim": len(embedding_vector)}
+                metadata={
+                    "query_length": len(query),
+                    "embedding_dim": len(embedding_vector),
+                    "cache_hit": cache_hit
+                }
             )
             
             return embedding_vector, latency_ms
@@ -60,6 +102,80 @@ class EmbeddingService:
             logger.error(f"Error generating embeddings: {e}")
             raise
     
+    @staticmethod
+    def _as_vector(embedding) -> np.ndarray:
+        """float32, C-contiguous and read-only, since vectors are shared via the cache"""
+        vector = np.ascontiguousarray(embedding, dtype=np.float32)
+        vector.setflags(write=False)
+        return vector
+    
+    def _encode_batch(self, queries: List[str]) -> List[np.ndarray]:
+        """One encode() call for a micro-batch of queries"""
+        embeddings = self.model.encode(queries, batch_size=settings.embedding_batch_size)
+        return [self._as_vector(embedding) for embedding in embeddings]
+    
+    def embed_queries(self, queries: List[str]) -> tuple[List[np.ndarray], float]:
+        """
+        Generate embeddings for several queries with one model forward pass
+        
+        Cached queries are not re-encoded; only the misses are stacked into
+        a single encode() call.
+        
+        Args:
+            queries: Input query strings
+            
+        Returns:
+            Tuple of (embedding vectors in input order, latency in ms)
+        """
+        try:
+            start_time = time.perf_counter()
+            
+            keys = [self._cache_key(query) for query in queries]
+            with self._cache_lock:
+                vectors = [self._cache.get(key) for key in keys]
+                missing = [i for i, vector in enumerate(vectors) if vector is None]
+                self._cache_hits += len(queries) - len(missing)
+                self._cache_misses += len(missing)
+            
+            if missing:
+                embeddings = self.model.encode([queries[i] for i in missing])
+                with self._cache_lock:
+                    for i, embedding in zip(missing, embeddings):
+                        vectors[i] = self._as_vector(embedding)
+                        self._cache[keys[i]] = vectors[i]
+            
+            latency_ms = (time.perf_counter() - start_time) * 1000
+            
+            logger.log_node_execution(
+                node_name="EmbedNode",
+                latency_ms=latency_ms,
+                metadata={"batch_size": len(queries), "encoded": len(missing)}
+            )
+            
+            return vectors, latency_ms
+            
+        except Exception as e:
+            logger.error(f"Error generating batch embeddings: {e}")
+            raise
+    
+    @staticmethod
+    def _cache_key(query: str) -> str:
+        """Hash of the whitespace-normalized query, partitioned by model dimension"""
+        normalized = " ".join(query.split())
+        digest = hashlib.sha256(normalized.encode()).hexdigest()
+        return f"emb:{settings.embedding_dimension}:{digest}"
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit-rate statistics for the embedding cache"""
+        with self._cache_lock:
+            total = self._cache_hits + self._cache_misses
+            return {
+                "hits": self._cache_hits,
+                "misses": self._cache_misses,
+                "hit_rate": round(self._cache_hits / total, 4) if total else 0.0,
+                "size": len(self._cache)
+            }
+    
     def get_dimension(self) -> int:
         """Get embedding dimension"""
         return self.model.get_sentence_embedding_dimension()
@@ -1,8 +1,9 @@
 """
 LLM generation service supporting Gemini
 """
+import asyncio
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, AsyncIterator, Optional
 
 import google.generativeai as genai
 
@@ -13,11 +14,81 @@ logger = get_logger(__name__)
 settings = get_settings()
 
 
+# Static parts of the RAG prompt, split around the per-request context and question
+_PROMPT_PREFIX = """You are KrishiMitra, an AI assistant specialized in Indian agriculture. Answer the farmer's question using the information provided below.
+
+Context Information:
+"""
+_PROMPT_QUESTION = "\n\nQuestion: "
+_PROMPT_INSTRUCTIONS = """
+
+Instructions:
+1. Provide a helpful, direct answer using the information available
+2. When asked about specific regions/states:
+   - Use exact regional data if available
+   - Otherwise, provide general agricultural guidelines that apply to similar conditions
+   - Mention the region/state naturally in your answer when relevant
+3. Combine information from multiple sources to give complete, practical answers
+4. Include specific details like:
+   - Crop varieties and characteristics
+   - NPK values and fertilizer recommendations
+   - Sowing times, spacing, and seed rates
+   - Pest/disease management practices
+   - Regional or seasonal variations
+5. Write in simple, conversational language as if advising a farmer directly
+6. Be confident and helpful - focus on what you can tell them
+7. Only mention lack of information if the question is completely outside agriculture or if truly no relevant information exists
+
+Answer the question naturally and helpfully:"""
+
+
+def _format_context_chunk(index: int, chunk: Dict[str, Any]) -> str:
+    """Context block for one chunk: a [Source i | State | Crop | Season | File] header and its text"""
+    metadata = chunk.get("metadata", {})
+    header = f"[Source {index}"
+    # Only the metadata fields that are present are included
+    for label, key in (("State", "state"), ("Crop", "crop"), ("Season", "season")):
+        value = metadata.get(key, "")
+        if value:
+            header += f" | {label}: {value}"
+    header += f" | File: {metadata.get('filename', 'unknown')}]"
+    return f"{header}\n{chunk.get('text', '')}"
+
+
+def _select_context_chunks(retrieved_chunks: List[Dict[str, Any]], max_tokens: int) -> List[Dict[str, Any]]:
+    """
+    Highest-scoring chunks first, dropping repeated text, until the token budget is used
+    
+    Tokens are estimated as len(text) // 4. The best chunk is always kept.
+    Overlapping ingestion windows often return the same passage twice;
+    chunks are treated as duplicates when their first 128 characters match
+    after whitespace normalization.
+    """
+    selected = []
+    seen = set()
+    used_tokens = 0
+    for chunk in sorted(retrieved_chunks, key=lambda c: c.get("score", 0.0), reverse=True):
+        text = chunk.get("text", "")
+        signature = hash(" ".join(text[:256].split())[:128])
+        if signature in seen:
+            continue
+        tokens = len(text) // 4
+        if selected and used_tokens + tokens > max_tokens:
+            continue
+        seen.add(signature)
+        used_tokens += tokens
+        selected.append(chunk)
+    return selected
+
+
 class GenerationService:
     """Handles text generation using Gemini LLM"""
     
     def __init__(self):
         self.gemini_model = None
+        # Bounds concurrent async Gemini calls (rate limits) without holding
+        # up the embed/retrieve stages of other requests
+        self._gemini_slots = asyncio.Semaphore(settings.gemini_concurrency)
         self._initialize()
     
     def _initialize(self):
@@ -57,61 +128,13 @@ class GenerationService:
         Returns:
             Formatted prompt string
         """
-        # Combine retrieved text with metadata
-        context_texts = []
-        for i, chunk in enumerate(retrieved_chunks, 1):
-            text = chunk.get("text", "")
-            metadata = chunk.get("metadata", {})
-            
-            # Extract useful metadata
-            filename = metadata.get("filename", "unknown")
-            state = metadata.get("state", "")
-            crop = metadata.get("crop", "")
-            season = metadata.get("season", "")
-            
-            # Build context header with available metadata
-            header_parts = [f"Source {i}"]
-            if state:
-                header_parts.append(f"State: {state}")
-            if crop:
-                header_parts.append(f"Crop: {crop}")
-            if season:
-                header_parts.append(f"Season: {season}")
-            header_parts.append(f"File: {filename}")
-            
-            header = "[" + " | ".join(header_parts) + "]"
-            context_texts.append(f"{header}\n{text}")
-        
-        combined_context = "\n\n".join(context_texts)
-        
-        # Create RAG prompt
-        prompt = f"""You are KrishiMitra, an AI assistant specialized in Indian agriculture. Answer the farmer's question using the information provided below.
-
-Context Information:
-{combined_context}
-
-Question: {query}
-
-Instructions:
-1. Provide a helpful, direct answer using the information available
-2. When asked about specific regions/states:
-   - Use exact regional data if available
-   - Otherwise, provide general agricultural guidelines that apply to similar conditions
-   - Mention the region/state naturally in your answer when relevant
-3. Combine information from multiple sources to give complete, practical answers
-4. Include specific details like:
-   - Crop varieties and characteristics
-   - NPK values and fertilizer recommendations
-   - Sowing times, spacing, and seed rates
-   - Pest/disease management practices
-   - Regional or seasonal variations
-5. Write in simple, conversational language as if advising a farmer directly
-6. Be confident and helpful - focus on what you can tell them
-7. Only mention lack of information if the question is completely outside agriculture or if truly no relevant information exists
-
-Answer the question naturally and helpfully:"""
-        
-        return prompt
+        # Combine retrieved text with metadata; the static instruction text
+        # around it is built once at import (_PROMPT_*)
+        context_chunks = _select_context_chunks(retrieved_chunks, settings.max_context_tokens)
+        combined_context = "\n\n".join(
+            _format_context_chunk(i, chunk) for i, chunk in enumerate(context_chunks, 1)
+        )
+        return "".join((_PROMPT_PREFIX, combined_context, _PROMPT_QUESTION, query, _PROMPT_INSTRUCTIONS))
     
     def generate_answer(
         self, 
@@ -138,7 +161,7 @@ Answer the question naturally and helpfully:"""
             temperature = settings.temperature
         
         try:
-            start_time = time.time()
+            start_time = time.perf_counter()
             
             # Create RAG prompt
             prompt = self._create_rag_prompt(query, retrieved_chunks)
@@ -146,7 +169,51 @@ Answer the question naturally and helpfully:"""
             # Generate response using Gemini
             response = self._generate_with_gemini_sync(prompt, max_tokens, temperature)
             
-            latency_ms = (time.time() - start_time) * 1000
+            latency_ms = (time.perf_counter() - start_time) * 1000
+            
+            logger.log_node_execution(
+                node_name="GenerateNode",
+                latency_ms=latency_ms,
+                metadata={"provider": settings.llm_provider, "model": response["model"]}
+            )
+            
+            return response["text"], latency_ms
+            
+        except Exception as e:
+            logger.error(f"Error generating answer: {e}")
+            raise
+    
+    async def generate_answer_async(
+        self, 
+        query: str, 
+        retrieved_chunks: List[Dict[str, Any]],
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None
+    ) -> tuple[str, float]:
+        """
+        Async variant of generate_answer; the Gemini call does not hold a thread
+        
+        Args:
+            query: User's question
+            retrieved_chunks: Retrieved document chunks
+            max_tokens: Maximum tokens to generate
+            temperature: Generation temperature
+            
+        Returns:
+            Tuple of (generated answer, latency in ms)
+        """
+        if max_tokens is None:
+            max_tokens = settings.max_tokens
+        if temperature is None:
+            temperature = settings.temperature
+        
+        try:
+            start_time = time.perf_counter()
+            
+            prompt = self._create_rag_prompt(query, retrieved_chunks)
+            response = await self._generate_with_gemini_async(prompt, max_tokens, temperature)
+            
+            latency_ms = (time.perf_counter() - start_time) * 1000
             
             logger.log_node_execution(
                 node_name="GenerateNode",
@@ -160,6 +227,62 @@ Answer the question naturally and helpfully:"""
             logger.error(f"Error generating answer: {e}")
             raise
     
+    async def astream_answer(
+        self,
+        query: str,
+        retrieved_chunks: List[Dict[str, Any]],
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Generate an answer using retrieved context, yielding text as Gemini produces it
+        
+        Args:
+            query: User's question
+            retrieved_chunks: Retrieved document chunks
+            max_tokens: Maximum tokens to generate
+            temperature: Generation temperature
+            
+        Yields:
+            Successive text fragments of the answer
+        """
+        if max_tokens is None:
+            max_tokens = settings.max_tokens
+        if temperature is None:
+            temperature = settings.temperature
+        
+        start_time = time.perf_counter()
+        prompt = self._create_rag_prompt(query, retrieved_chunks)
+        generation_config = genai.types.GenerationConfig(
+            max_output_tokens=max_tokens,
+            temperature=temperature,
+        )
+        
+        try:
+            async with self._gemini_slots:
+                response = await self.gemini_model.generate_content_async(
+                    prompt,
+                    generation_config=generation_config,
+                    stream=True
+                )
+                async for chunk in response:
+                    # Chunks without text (e.g. safety metadata only) are skipped
+                    try:
+                        text = chunk.text
+                    except (ValueError, AttributeError):
+                        continue
+                    if text:
+                        yield text
+        except Exception as e:
+            logger.error(f"Gemini streaming error: {e}")
+            raise
+        
+        logger.log_node_execution(
+            node_name="GenerateNode",
+            latency_ms=(time.perf_counter() - start_time) * 1000,
+            metadata={"provider": settings.llm_provider, "model": settings.gemini_model, "stream": True}
+        )
+    
     def _generate_with_gemini_sync(
         self, 
         prompt: str, 
@@ -178,38 +301,36 @@ Answer the question naturally and helpfully:"""
                 generation_config=generation_config
             )
             
-            # Extract text from response, handling multi-part responses
-            text = ""
+            return {
+                "text": self._extract_text(response),
+                "model": settings.gemini_model
+            }
             
-            # Check if response was blocked
-            if not response.candidates:
-                logger.error(f"Gemini response blocked. Prompt feedback: {response.prompt_feedback}")
-                raise ValueError(f"Response blocked by Gemini safety filters: {response.prompt_feedback}")
+        except Exception as e:
+            logger.error(f"Gemini generation error: {e}")
+            raise
+    
+    async def _generate_with_gemini_async(
+        self, 
+        prompt: str, 
+        max_tokens: int, 
+        temperature: float
+    ) -> Dict[str, Any]:
+        """Generate response using Gemini over the async gRPC client"""
+        try:
+            generation_config = genai.types.GenerationConfig(
+                max_output_tokens=max_tokens,
+                temperature=temperature,
+            )
             
-            try:
-                # Try simple text accessor first
-                text = response.text
-            except (ValueError, AttributeError) as e:
-                # If that fails, extract from parts
-                logger.warning(f"Simple text accessor failed: {e}. Trying parts extraction.")
-                if response.candidates:
-                    candidate = response.candidates[0]
-                    
-                    # Check if candidate was blocked
-                    if hasattr(candidate, 'finish_reason') and candidate.finish_reason != 1:  # 1 = STOP (normal)
-                        logger.error(f"Candidate finish reason: {candidate.finish_reason}")
-                    
-                    if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
-                        for part in candidate.content.parts:
-                            if hasattr(part, 'text'):
-                                text += part.text
-                
-                if not text:
-                    logger.error(f"Full response: {response}")
-                    raise ValueError(f"No text content in Gemini response. Finish reason: {candidate.finish_reason if response.candidates else 'No candidates'}")
+            async with self._gemini_slots:
+                response = await self.gemini_model.generate_content_async(
+                    prompt,
+                    generation_config=generation_config
+                )
             
             return {
-                "text": text,
+                "text": self._extract_text(response),
                 "model": settings.gemini_model
             }
             
@@ -217,6 +338,31 @@ Answer the question naturally and helpfully:"""
             logger.error(f"Gemini generation error: {e}")
             raise
     
+    @staticmethod
+    def _extract_text(response) -> str:
+        """Answer text from a Gemini response, handling multi-part and blocked responses"""
+        try:
+            # Fast path: single-part response
+            return response.text
+        except ValueError:
+            pass
+        
+        # Multi-part response; inspect the response only on failure
+        try:
+            text = "".join(part.text for part in response.candidates[0].content.parts)
+        except (IndexError, AttributeError):
+            text = ""
+        
+        if not text:
+            if not response.candidates:
+                logger.error(f"Gemini response blocked. Prompt feedback: {response.prompt_feedback}")
+                raise ValueError(f"Response blocked by Gemini safety filters: {response.prompt_feedback}")
+            finish_reason = response.candidates[0].finish_reason
+            logger.error(f"Full response: {response}")
+            raise ValueError(f"No text content in Gemini response. Finish reason: {finish_reason}")
+        
+        return text
+    
     def health_check(self) -> Dict[str, Any]:
         """
         Perform health check on generation service
@@ -1,12 +1,18 @@
 """
 LangGraph orchestration pipeline for RAG workflow
 """
+import asyncio
+import functools
 import time
-from typing import TypedDict, List, Dict, Any, Optional
-from langgraph.graph import StateGraph, END
+import numpy as np
+from typing import TypedDict, List, Dict, Any, AsyncIterator, Optional
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import StateGraph, START, END
+from starlette.concurrency import run_in_threadpool
 
 from services.embeddings import embedding_service
-from services.retrieval import retrieval_service
+from services.retrieval import get_retrieval_service
+from services.reranker import get_reranker_service
 from services.generation import generation_service
 from core.config import get_settings
 from core.logging import get_logger
@@ -22,7 +28,7 @@ class RAGState(TypedDict):
     filters: Optional[Dict[str, Any]]
     
     # Intermediate results
-    query_embedding: Optional[List[float]]
+    query_embedding: Optional[np.ndarray]
     retrieved_chunks: Optional[List[Dict[str, Any]]]
     sources: Optional[List[Dict[str, Any]]]
     answer: Optional[str]
@@ -30,6 +36,7 @@ class RAGState(TypedDict):
     # Latency tracking
     embed_latency_ms: Optional[float]
     retrieve_latency_ms: Optional[float]
+    rerank_latency_ms: Optional[float]
     generate_latency_ms: Optional[float]
     total_latency_ms: Optional[float]
     
@@ -37,86 +44,123 @@ class RAGState(TypedDict):
     error: Optional[str]
 
 
-def embed_node(state: RAGState) -> RAGState:
+def _graph_node(name: str, stage: str):
     """
-    EmbedNode: Convert query text to embedding vector
+    Turn an exception raised inside a node into an {"error": ...} update;
+    the conditional edges then end the run instead of calling later nodes
     """
-    try:
-        logger.info(f"EmbedNode: Processing query of length {len(state['query'])}")
-        
-        query_embedding, latency_ms = embedding_service.embed_query(state["query"])
-        
-        state["query_embedding"] = query_embedding
-        state["embed_latency_ms"] = latency_ms
-        
-        return state
+    def decorate(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(state: RAGState) -> Dict[str, Any]:
+                try:
+                    return await fn(state)
+                except Exception as e:
+                    logger.error(f"{name} failed: {e}")
+                    return {"error": f"{stage} failed: {str(e)}"}
+            return async_wrapper
         
-    except Exception as e:
-        logger.error(f"EmbedNode failed: {e}")
-        state["error"] = f"Embedding failed: {str(e)}"
-        return state
+        @functools.wraps(fn)
+        def wrapper(state: RAGState) -> Dict[str, Any]:
+            try:
+                return fn(state)
+            except Exception as e:
+                logger.error(f"{name} failed: {e}")
+                return {"error": f"{stage} failed: {str(e)}"}
+        return wrapper
+    return decorate
+
+
+def _unless_error(next_node: str):
+    """Conditional edge: continue to next_node, or stop once a node has failed"""
+    return lambda state: END if state.get("error") else next_node
+
+
+@_graph_node("EmbedNode", "Embedding")
+def embed_node(state: RAGState) -> Dict[str, Any]:
+    """
+    EmbedNode: Convert query text to embedding vector
+    """
+    logger.info(f"EmbedNode: Processing query of length {len(state['query'])}")
+    
+    query_embedding, latency_ms = embedding_service.embed_query(state["query"])
+    
+    return {"query_embedding": query_embedding, "embed_latency_ms": latency_ms}
 
 
-def retrieve_node(state: RAGState) -> RAGState:
+@_graph_node("RetrieveNode", "Retrieval")
+def retrieve_node(state: RAGState) -> Dict[str, Any]:
     """
     RetrieveNode: Fetch top-k similar chunks from Pinecone
     """
-    try:
-        if state.get("error"):
-            return state
-        
-        if not state.get("query_embedding"):
-            state["error"] = "No query embedding available"
-            return state
-        
-        logger.info(f"RetrieveNode: Retrieving top {state['top_k']} chunks")
-        
-        results, latency_ms = retrieval_service.retrieve_chunks(
-            query_embedding=state["query_embedding"],
-            top_k=state["top_k"],
-            filter_dict=state.get("filters")
-        )
-        
-        state["retrieved_chunks"] = results["chunks"]
-        state["sources"] = results["sources"]
-        state["retrieve_latency_ms"] = latency_ms
-        
-        return state
-        
-    except Exception as e:
-        logger.error(f"RetrieveNode failed: {e}")
-        state["error"] = f"Retrieval failed: {str(e)}"
-        return state
+    logger.info(f"RetrieveNode: Retrieving top {state['top_k']} chunks")
+    
+    # With reranking on, fetch a wider candidate set for RerankNode to cut down
+    top_k = max(state["top_k"], settings.rerank_candidates) if settings.rerank_model else state["top_k"]
+    results, latency_ms = get_retrieval_service().retrieve_chunks(
+        query_embedding=state["query_embedding"],
+        top_k=top_k,
+        filter_dict=state.get("filters")
+    )
+    
+    return {
+        "retrieved_chunks": results["chunks"],
+        "sources": results["sources"],
+        "retrieve_latency_ms": latency_ms
+    }
+
+
+@_graph_node("RerankNode", "Reranking")
+def rerank_node(state: RAGState) -> Dict[str, Any]:
+    """
+    RerankNode: Reorder retrieved chunks with a cross-encoder and keep top_k
+    """
+    chunks, latency_ms = get_reranker_service().rerank(
+        state["query"], state["retrieved_chunks"], state["top_k"]
+    )
+    sources_by_id = {source["chunk_id"]: source for source in state["sources"]}
+    
+    return {
+        "retrieved_chunks": chunks,
+        "sources": [sources_by_id[chunk["id"]] for chunk in chunks],
+        "rerank_latency_ms": latency_ms
+    }
 
 
-def generate_node(state: RAGState) -> RAGState:
+@_graph_node("GenerateNode", "Generation")
+def generate_node(state: RAGState) -> Dict[str, Any]:
     """
     GenerateNode: Generate answer using LLM with retrieved context
     """
-    try:
-        if state.get("error"):
-            return state
-        
-        if not state.get("retrieved_chunks"):
-            state["error"] = "No retrieved chunks available"
-            return state
-        
-        logger.info(f"GenerateNode: Generating answer with {len(state['retrieved_chunks'])} chunks")
-        
-        answer, latency_ms = generation_service.generate_answer(
-            query=state["query"],
-            retrieved_chunks=state["retrieved_chunks"]
-        )
-        
-        state["answer"] = answer
-        state["generate_latency_ms"] = latency_ms
-        
-        return state
-        
-    except Exception as e:
-        logger.error(f"GenerateNode failed: {e}")
-        state["error"] = f"Generation failed: {str(e)}"
-        return state
+    if not state.get("retrieved_chunks"):
+        return {"error": "No retrieved chunks available"}
+    
+    logger.info(f"GenerateNode: Generating answer with {len(state['retrieved_chunks'])} chunks")
+    
+    answer, latency_ms = generation_service.generate_answer(
+        query=state["query"],
+        retrieved_chunks=state["retrieved_chunks"]
+    )
+    
+    return {"answer": answer, "generate_latency_ms": latency_ms}
+
+
+@_graph_node("GenerateNode", "Generation")
+async def agenerate_node(state: RAGState) -> Dict[str, Any]:
+    """
+    GenerateNode (async): same as generate_node, awaiting Gemini instead of blocking a thread
+    """
+    if not state.get("retrieved_chunks"):
+        return {"error": "No retrieved chunks available"}
+    
+    logger.info(f"GenerateNode: Generating answer with {len(state['retrieved_chunks'])} chunks")
+    
+    answer, latency_ms = await generation_service.generate_answer_async(
+        query=state["query"],
+        retrieved_chunks=state["retrieved_chunks"]
+    )
+    
+    return {"answer": answer, "generate_latency_ms": latency_ms}
 
 
 class LangGraphRAGPipeline:
@@ -124,14 +168,50 @@ class LangGraphRAGPipeline:
     
     def __init__(self):
         self.graph = self._build_graph()
+        # Set once warmup() has run (or when warm-up is skipped at startup)
+        self.warm = False
         logger.info("LangGraph RAG Pipeline initialized")
     
+    async def warmup(self) -> None:
+        """
+        Load the embedding model and open the Pinecone connection with a
+        throwaway embed + retrieve, so the first real query does not pay
+        for them. Generation is not exercised (it would spend API quota).
+        """
+        start_time = time.perf_counter()
+        state = await self._embed_and_retrieve(self._initial_state("warmup", 1, None))
+        if state.get("error"):
+            logger.warning(f"Pipeline warm-up incomplete: {state['error']}")
+        else:
+            logger.info(f"Pipeline warmed up in {(time.perf_counter() - start_time) * 1000:.0f}ms")
+        self.warm = True
+    
+    async def prefetch(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Embed + retrieve a query the client expects to send next, so the real
+        request finds both stages in the embedding and retrieval caches
+        """
+        state = await self._embed_and_retrieve(self._initial_state(query, top_k, filters))
+        if state.get("error"):
+            logger.warning(f"Prefetch failed: {state['error']}")
+    
     def _build_graph(self) -> StateGraph:
         """
         Build the LangGraph workflow
         
         Workflow:
-        START -> EmbedNode -> RetrieveNode -> GenerateNode -> END
+        START -> EmbedNode -> RetrieveNode [-> RerankNode] -> GenerateNode -> END
+        
+        RerankNode is only added when RERANK_MODEL is configured.
+        
+        Nodes return only the keys they set, so independent nodes (e.g. a
+        query classifier next to EmbedNode) can be added as parallel
+        branches from START without conflicting state writes.
         """
         # Create graph
         workflow = StateGraph(RAGState)
@@ -139,17 +219,75 @@ class LangGraphRAGPipeline:
         # Add nodes
         workflow.add_node("embed", embed_node)
         workflow.add_node("retrieve", retrieve_node)
-        workflow.add_node("generate", generate_node)
+        # invoke() uses generate_node, ainvoke() uses agenerate_node
+        workflow.add_node("generate", RunnableLambda(generate_node, afunc=agenerate_node, name="generate"))
         
-        # Define edges
-        workflow.set_entry_point("embed")
-        workflow.add_edge("embed", "retrieve")
-        workflow.add_edge("retrieve", "generate")
+        # Define edges; a failed node ends the run with "error" set
+        workflow.add_edge(START, "embed")
+        workflow.add_conditional_edges("embed", _unless_error("retrieve"), ["retrieve", END])
+        if settings.rerank_model:
+            workflow.add_node("rerank", rerank_node)
+            workflow.add_conditional_edges("retrieve", _unless_error("rerank"), ["rerank", END])
+            workflow.add_conditional_edges("rerank", _unless_error("generate"), ["generate", END])
+        else:
+            workflow.add_conditional_edges("retrieve", _unless_error("generate"), ["generate", END])
         workflow.add_edge("generate", END)
         
         # Compile graph
         return workflow.compile()
     
+    @staticmethod
+    async def _embed_and_retrieve(state: RAGState) -> RAGState:
+        """Run EmbedNode, RetrieveNode (and RerankNode) outside the graph, stopping at the first error"""
+        nodes = (embed_node, retrieve_node, rerank_node) if settings.rerank_model else (embed_node, retrieve_node)
+        for node in nodes:
+            state.update(await run_in_threadpool(node, state))
+            if state.get("error"):
+                break
+        return state
+    
+    @staticmethod
+    def _initial_state(query: str, top_k: int, filters: Optional[Dict[str, Any]]) -> RAGState:
+        return {
+            "query": query,
+            "top_k": top_k,
+            "filters": filters,
+            "query_embedding": None,
+            "retrieved_chunks": None,
+            "sources": None,
+            "answer": None,
+            "embed_latency_ms": None,
+            "retrieve_latency_ms": None,
+            "rerank_latency_ms": None,
+            "generate_latency_ms": None,
+            "total_latency_ms": None,
+            "error": None
+        }
+    
+    def _finish(self, final_state: RAGState, query: str, start_time: float) -> Dict[str, Any]:
+        """Check the final graph state, log metrics and format the response"""
+        # Calculate total latency
+        total_latency_ms = (time.perf_counter() - start_time) * 1000
+        final_state["total_latency_ms"] = total_latency_ms
+        
+        # Check for errors
+        if final_state.get("error"):
+            logger.error(f"Pipeline failed: {final_state['error']}")
+            raise Exception(final_state["error"])
+        
+        # Log metrics
+        logger.log_query_metrics(
+            query=query,
+            total_latency_ms=total_latency_ms,
+            retrieval_latency_ms=final_state.get("retrieve_latency_ms", 0),
+            generation_latency_ms=final_state.get("generate_latency_ms", 0),
+            num_chunks=len(final_state.get("retrieved_chunks", [])),
+            success=True
+        )
+        
+        # Format response
+        return self._format_response(final_state)
+    
     def run(
         self, 
         query: str, 
@@ -167,55 +305,100 @@ class LangGraphRAGPipeline:
         Returns:
             Complete RAG response with answer, sources, and latencies
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
-            # Initialize state
-            initial_state: RAGState = {
-                "query": query,
-                "top_k": top_k,
-                "filters": filters,
-                "query_embedding": None,
-                "retrieved_chunks": None,
-                "sources": None,
-                "answer": None,
-                "embed_latency_ms": None,
-                "retrieve_latency_ms": None,
-                "generate_latency_ms": None,
-                "total_latency_ms": None,
-                "error": None
-            }
-            
             # Execute graph
             logger.info(f"Executing RAG pipeline for query: {query[:100]}...")
-            final_state = self.graph.invoke(initial_state)
-            
-            # Calculate total latency
-            total_latency_ms = (time.time() - start_time) * 1000
-            final_state["total_latency_ms"] = total_latency_ms
-            
-            # Check for errors
-            if final_state.get("error"):
-                logger.error(f"Pipeline failed: {final_state['error']}")
-                raise Exception(final_state["error"])
-            
-            # Log metrics
-            logger.log_query_metrics(
-                query=query,
-                total_latency_ms=total_latency_ms,
-                retrieval_latency_ms=final_state.get("retrieve_latency_ms", 0),
-                generation_latency_ms=final_state.get("generate_latency_ms", 0),
-                num_chunks=len(final_state.get("retrieved_chunks", [])),
-                success=True
-            )
+            final_state = self.graph.invoke(self._initial_state(query, top_k, filters))
+            return self._finish(final_state, query, start_time)
             
-            # Format response
-            return self._format_response(final_state)
+        except Exception as e:
+            logger.error(f"Pipeline execution failed: {e}")
+            raise
+    
+    async def arun(
+        self, 
+        query: str, 
+        top_k: int = 5, 
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute the RAG pipeline without blocking the event loop
+        
+        LangGraph runs the sync embed/retrieve nodes on its executor and
+        awaits the async generate node.
+        
+        Returns:
+            Complete RAG response with answer, sources, and latencies
+        """
+        start_time = time.perf_counter()
+        
+        try:
+            logger.info(f"Executing RAG pipeline for query: {query[:100]}...")
+            final_state = await self.graph.ainvoke(self._initial_state(query, top_k, filters))
+            return self._finish(final_state, query, start_time)
             
         except Exception as e:
             logger.error(f"Pipeline execution failed: {e}")
             raise
     
+    async def astream(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute the RAG pipeline, streaming the answer as it is generated
+        
+        Embed and retrieve run as in run(); generation is streamed from
+        Gemini instead of going through the GenerateNode.
+        
+        Yields:
+            One {"type": "sources", "sources": ...} event once retrieval is
+            done, {"type": "token", "text": ...} events, then one
+            {"type": "done", ...} event carrying sources, retrieved chunks
+            and latencies (including ttft_ms, time to the first token)
+        """
+        start_time = time.perf_counter()
+        state = await self._embed_and_retrieve(self._initial_state(query, top_k, filters))
+        if state.get("error"):
+            logger.error(f"Pipeline failed: {state['error']}")
+            raise Exception(state["error"])
+        if not state.get("retrieved_chunks"):
+            raise Exception("No retrieved chunks available")
+        
+        # Sources are known before generation starts; let the client render them
+        yield {"type": "sources", "sources": state["sources"]}
+        
+        generate_start = time.perf_counter()
+        ttft_ms = None
+        answer_parts = []
+        async for text in generation_service.astream_answer(query, state["retrieved_chunks"]):
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - start_time) * 1000
+            answer_parts.append(text)
+            yield {"type": "token", "text": text}
+        
+        state["answer"] = "".join(answer_parts)
+        state["generate_latency_ms"] = (time.perf_counter() - generate_start) * 1000
+        state["total_latency_ms"] = (time.perf_counter() - start_time) * 1000
+        
+        logger.log_query_metrics(
+            query=query,
+            total_latency_ms=state["total_latency_ms"],
+            retrieval_latency_ms=state.get("retrieve_latency_ms", 0),
+            generation_latency_ms=state["generate_latency_ms"],
+            num_chunks=len(state["retrieved_chunks"]),
+            success=True
+        )
+        
+        response = self._format_response(state)
+        if ttft_ms is not None:
+            response["node_latencies"]["ttft_ms"] = ttft_ms
+        yield {"type": "done", **response}
+    
     def _format_response(self, state: RAGState) -> Dict[str, Any]:
         """
         Format the final state into API response
@@ -232,16 +415,20 @@ class LangGraphRAGPipeline:
             for chunk in state.get("retrieved_chunks", [])
         ]
         
+        node_latencies = {
+            "embed_ms": state.get("embed_latency_ms", 0),
+            "retrieve_ms": state.get("retrieve_latency_ms", 0),
+            "generate_ms": state.get("generate_latency_ms", 0)
+        }
+        if state.get("rerank_latency_ms") is not None:
+            node_latencies["rerank_ms"] = state["rerank_latency_ms"]
+        
         return {
             "answer": state.get("answer", ""),
             "sources": state.get("sources", []),
             "retrieved_chunks": retrieved_chunks_text,
             "latency_ms": int(state.get("total_latency_ms", 0)),
-            "node_latencies": {
-                "embed_ms": state.get("embed_latency_ms", 0),
-                "retrieve_ms": state.get("retrieve_latency_ms", 0),
-                "generate_ms": state.get("generate_latency_ms", 0)
-            }
+            "node_latencies": node_latencies
         }
     
     def get_graph_structure(self) -> Dict[str, Any]:
@@ -251,20 +438,26 @@ class LangGraphRAGPipeline:
         Returns:
             Graph structure with nodes and edges
         """
+        nodes = [
+            {"id": "embed", "name": "EmbedNode", "type": "embedding"},
+            {"id": "retrieve", "name": "RetrieveNode", "type": "retrieval"},
+            {"id": "generate", "name": "GenerateNode", "type": "generation"}
+        ]
+        path = ["START", "embed", "retrieve", "generate", "END"]
+        if settings.rerank_model:
+            nodes.insert(2, {"id": "rerank", "name": "RerankNode", "type": "reranking"})
+            path.insert(3, "rerank")
+        
         return {
-            "nodes": [
-                {"id": "embed", "name": "EmbedNode", "type": "embedding"},
-                {"id": "retrieve", "name": "RetrieveNode", "type": "retrieval"},
-                {"id": "generate", "name": "GenerateNode", "type": "generation"}
-            ],
+            "nodes": nodes,
             "edges": [
-                {"source": "START", "target": "embed", "condition": None},
-                {"source": "embed", "target": "retrieve", "condition": None},
-                {"source": "retrieve", "target": "generate", "condition": None},
-                {"source": "generate", "target": "END", "condition": None}
+                {"source": source, "target": target, "condition": None}
+                for source, target in zip(path, path[1:])
             ],
             "entry_point": "embed",
-            "description": "LangGraph-orchestrated RAG pipeline: Embed -> Retrieve -> Generate"
+            "description": "LangGraph-orchestrated RAG pipeline: " + " -> ".join(
+                node["name"][:-len("Node")] for node in nodes
+            )
         }
     
     def health_check(self) -> Dict[str, Any]:
@@ -276,30 +469,18 @@ class LangGraphRAGPipeline:
         """
         try:
             # Test with a simple query
-            test_state: RAGState = {
-                "query": "test",
-                "top_k": 1,
-                "filters": None,
-                "query_embedding": None,
-                "retrieved_chunks": None,
-                "sources": None,
-                "answer": None,
-                "embed_latency_ms": None,
-                "retrieve_latency_ms": None,
-                "generate_latency_ms": None,
-                "total_latency_ms": None,
-                "error": None
-            }
+            test_state = self._initial_state("test", 1, None)
             
             # Test embedding
-            test_state = embed_node(test_state)
+            test_state.update(embed_node(test_state))
             
             if test_state.get("error"):
                 return {"status": "unhealthy", "error": test_state["error"]}
             
             return {
                 "status": "running",
-                "nodes": ["embed", "retrieve", "generate"],
+                "warm": self.warm,
+                "nodes": ["embed", "retrieve", "rerank", "generate"] if settings.rerank_model else ["embed", "retrieve", "generate"],
                 "graph_compiled": True
             }
             
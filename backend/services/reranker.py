@@ -0,0 +1,95 @@
+"""
+Cross-encoder reranking of retrieved chunks
+"""
+import time
+from threading import Lock
+from typing import Any, Dict, List
+
+import numpy as np
+from sentence_transformers import CrossEncoder
+
+from core.config import get_settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+class RerankerService:
+    """Scores (query, chunk) pairs with a cross-encoder and keeps the best"""
+
+    def __init__(self):
+        self.model = None
+        self._initialize()
+
+    def _initialize(self):
+        """Initialize reranking model"""
+        try:
+            logger.info(f"Loading reranker model: {settings.rerank_model} ({settings.rerank_backend})")
+            if settings.rerank_backend == "onnx":
+                # ONNX Runtime (optionally INT8-quantized) export from export_reranker_onnx.py
+                model_kwargs = {"file_name": settings.rerank_onnx_file} if settings.rerank_onnx_file else None
+                self.model = CrossEncoder(settings.rerank_model, backend="onnx", model_kwargs=model_kwargs)
+            else:
+                self.model = CrossEncoder(settings.rerank_model)
+            logger.info("Reranker model loaded successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize reranker model: {e}")
+            raise
+
+    def rerank(
+        self,
+        query: str,
+        chunks: List[Dict[str, Any]],
+        top_n: int
+    ) -> tuple[List[Dict[str, Any]], float]:
+        """
+        Reorder chunks by cross-encoder relevance and keep the top_n
+
+        Args:
+            query: User's question
+            chunks: Retrieved chunks (with "text" and vector "score")
+            top_n: Number of chunks to keep
+
+        Returns:
+            Tuple of (reranked chunks, latency in ms). Each chunk's "score"
+            becomes the reranker score; the similarity score moves to
+            "vector_score".
+        """
+        start_time = time.perf_counter()
+        if not chunks:
+            return [], 0.0
+
+        # All pairs in one forward pass
+        scores = self.model.predict(
+            [(query, chunk.get("text", "")) for chunk in chunks],
+            batch_size=len(chunks),
+            show_progress_bar=False
+        )
+        order = np.argsort(-np.asarray(scores))[:top_n]
+        reranked = [
+            {**chunks[i], "score": float(scores[i]), "vector_score": chunks[i].get("score")}
+            for i in order.tolist()
+        ]
+
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        logger.log_node_execution(
+            node_name="RerankNode",
+            latency_ms=latency_ms,
+            metadata={"candidates": len(chunks), "kept": len(reranked)}
+        )
+        return reranked, latency_ms
+
+
+# Global reranker instance (loaded on first use; only when RERANK_MODEL is set)
+reranker_service = None
+_reranker_service_lock = Lock()
+
+def get_reranker_service() -> RerankerService:
+    """Get or create the reranker service"""
+    global reranker_service
+    if reranker_service is None:
+        with _reranker_service_lock:
+            if reranker_service is None:
+                reranker_service = RerankerService()
+    return reranker_service
@@ -1,10 +1,19 @@
 """
 Pinecone retrieval service with embedding functionality
 """
+import asyncio
+import hashlib
+import os
 import time
-from typing import List, Dict, Any, Optional
+from threading import Lock
+from types import SimpleNamespace
+from typing import List, Dict, Any, Literal, Optional
 
+import numpy as np
+import orjson
+from cachetools import TTLCache
 from pinecone import Pinecone
+from pinecone.exceptions import NotFoundException
 
 from core.config import get_settings
 from core.logging import get_logger
@@ -13,28 +22,51 @@ logger = get_logger(__name__)
 settings = get_settings()
 
 
+def _wire_vector(query_embedding: np.ndarray) -> List[float]:
+    """Plain Python floats for the Pinecone client from the float32 embedding"""
+    return np.asarray(query_embedding, dtype=np.float32).tolist()
+
+
 class RetrievalService:
     """Handles document retrieval from Pinecone vector database"""
     
+    # Health probes hit get_index_stats every few seconds; reuse recent stats
+    INDEX_STATS_TTL = 10.0  # seconds
+    
     def __init__(self):
         self.pc = None
         self.index = None
+        self._index_stats: Optional[Dict[str, Any]] = None
+        self._index_stats_expiry = 0.0
+        # Processed results keyed by (embedding signature, top_k, filters)
+        self._cache = TTLCache(maxsize=settings.retrieval_cache_size, ttl=settings.retrieval_cache_ttl)
+        self._cache_lock = Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
         self._initialize()
     
     def _initialize(self):
         """Initialize Pinecone client"""
         try:
             # Initialize Pinecone with new API
-            self.pc = Pinecone(api_key=settings.pinecone_api_key)
+            if settings.pinecone_transport == "grpc":
+                # One multiplexed channel shared by all worker threads
+                from pinecone.grpc import PineconeGRPC
+                self.pc = PineconeGRPC(api_key=settings.pinecone_api_key)
+            else:
+                self.pc = Pinecone(api_key=settings.pinecone_api_key)
             
-            # Connect to existing index
-            existing_indexes = [idx.name for idx in self.pc.list_indexes()]
-            if settings.pinecone_index_name not in existing_indexes:
-                raise ValueError(f"Index '{settings.pinecone_index_name}' not found. Available indexes: {existing_indexes}")
+            # Connect to existing index; resolving its host is a single
+            # describe call that 404s for a missing index
+            try:
+                self.index = self.pc.Index(settings.pinecone_index_name)
+            except NotFoundException:
+                raise ValueError(f"Index '{settings.pinecone_index_name}' not found")
             
-            self.index = self.pc.Index(settings.pinecone_index_name)
-            
-            logger.info(f"Successfully connected to Pinecone index: {settings.pinecone_index_name}")
+            logger.info(
+                f"Successfully connected to Pinecone index: {settings.pinecone_index_name} "
+                f"({settings.pinecone_transport})"
+            )
             
         except Exception as e:
             logger.error(f"Failed to initialize retrieval service: {e}")
@@ -42,9 +74,10 @@ class RetrievalService:
     
     def retrieve_chunks(
         self, 
-        query_embedding: List[float], 
+        query_embedding: np.ndarray, 
         top_k: int = None, 
-        filter_dict: Optional[Dict[str, Any]] = None
+        filter_dict: Optional[Dict[str, Any]] = None,
+        project: Literal["full", "chunks", "sources"] = "full"
     ) -> tuple[Dict[str, Any], float]:
         """
         Retrieve similar chunks from Pinecone using query embedding
@@ -53,6 +86,8 @@ class RetrievalService:
             query_embedding: Query embedding vector
             top_k: Number of results to return
             filter_dict: Optional metadata filters
+            project: Build only "chunks" or only "sources" (the other list
+                is returned empty) when the caller does not need both
             
         Returns:
             Tuple of (retrieval results, latency in ms)
@@ -63,20 +98,26 @@ class RetrievalService:
         top_k = min(top_k, settings.max_top_k)
         
         try:
-            start_time = time.time()
-            
-            # Search in Pinecone
-            search_results = self.index.query(
-                vector=query_embedding,
-                top_k=top_k,
-                include_metadata=True,
-                filter=filter_dict
-            )
+            start_time = time.perf_counter()
             
-            # Process results
-            processed_results = self._process_search_results(search_results)
+            key = self._cache_key(query_embedding, top_k, filter_dict, project)
+            with self._cache_lock:
+                processed_results = self._cache.get(key)
+                if processed_results is not None:
+                    self._cache_hits += 1
+                else:
+                    self._cache_misses += 1
             
-            latency_ms = (time.time() - start_time) * 1000
+            if processed_results is None:
+                search_results = self._query(query_embedding, top_k, filter_dict)
+                
+                # Process results
+                processed_results = self._process_search_results(search_results, project)
+                
+                with self._cache_lock:
+                    self._cache[key] = processed_results
+            
+            latency_ms = (time.perf_counter() - start_time) * 1000
             
             logger.log_node_execution(
                 node_name="RetrieveNode",
@@ -90,40 +131,82 @@ class RetrievalService:
             logger.error(f"Error during retrieval: {e}")
             raise
     
-    def _process_search_results(self, search_results) -> Dict[str, Any]:
+    def _query(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        filter_dict: Optional[Dict[str, Any]]
+    ):
+        """Search in Pinecone"""
+        return self.index.query(
+            vector=_wire_vector(query_embedding),
+            top_k=top_k,
+            include_metadata=True,
+            filter=filter_dict
+        )
+    
+    @staticmethod
+    def _cache_key(
+        query_embedding: np.ndarray,
+        top_k: int,
+        filter_dict: Optional[Dict[str, Any]],
+        project: str = "full"
+    ) -> str:
+        """Signature of the float16-rounded embedding plus query parameters"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.asarray(query_embedding, dtype=np.float16).tobytes())
+        digest.update(str(top_k).encode())
+        if filter_dict:
+            digest.update(orjson.dumps(filter_dict, option=orjson.OPT_SORT_KEYS))
+        if project != "full":
+            digest.update(project.encode())
+        return digest.hexdigest()
+    
+    def clear_cache(self) -> None:
+        """Drop cached results (call after upserting into the index)"""
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit-rate statistics for the retrieval cache"""
+        with self._cache_lock:
+            total = self._cache_hits + self._cache_misses
+            return {
+                "hits": self._cache_hits,
+                "misses": self._cache_misses,
+                "hit_rate": round(self._cache_hits / total, 4) if total else 0.0,
+                "size": len(self._cache)
+            }
+    
+    def _process_search_results(self, search_results, project: str = "full") -> Dict[str, Any]:
         """
         Process raw Pinecone search results
         
         Args:
             search_results: Raw results from Pinecone query
+            project: "full", or "chunks"/"sources" to build only that list
             
         Returns:
             Processed results with chunks and sources
         """
-        chunks = []
-        sources = []
+        matches = search_results.matches
+        # One metadata reference per match, shared by chunk and source
+        metas = [match.metadata or {} for match in matches]
+        scores = [float(match.score) for match in matches]
         
-        for match in search_results.matches:
-            # Extract metadata
-            metadata = match.metadata or {}
-            
-            # Create chunk info
-            chunk_info = {
-                "id": match.id,
-                "text": metadata.get("text", ""),
-                "score": float(match.score),
-                "metadata": metadata
-            }
-            chunks.append(chunk_info)
-            
-            # Create source info
-            source_info = {
+        chunks = [] if project == "sources" else [
+            {"id": match.id, "text": metadata.get("text", ""), "score": score, "metadata": metadata}
+            for match, metadata, score in zip(matches, metas, scores)
+        ]
+        sources = [] if project == "chunks" else [
+            {
                 "source": metadata.get("filename", "unknown"),
-                "page": metadata.get("page", None),
+                "page": metadata.get("page"),
                 "chunk_id": match.id,
-                "score": float(match.score)
+                "score": score
             }
-            sources.append(source_info)
+            for match, metadata, score in zip(matches, metas, scores)
+        ]
         
         return {
             "chunks": chunks,
@@ -132,19 +215,25 @@ class RetrievalService:
     
     async def get_index_stats(self) -> Dict[str, Any]:
         """
-        Get Pinecone index statistics
+        Get Pinecone index statistics (cached for INDEX_STATS_TTL seconds)
         
         Returns:
             Index statistics and information
         """
+        if self._index_stats is not None and time.monotonic() < self._index_stats_expiry:
+            return self._index_stats
+        
         try:
-            stats = self.index.describe_index_stats()
-            return {
+            # Off the event loop: this is a blocking network call
+            stats = await asyncio.to_thread(self.index.describe_index_stats)
+            self._index_stats = {
                 "total_vectors": stats.total_vector_count,
                 "dimension": stats.dimension,
                 "index_fullness": stats.index_fullness,
                 "namespaces": dict(stats.namespaces) if stats.namespaces else {}
             }
+            self._index_stats_expiry = time.monotonic() + self.INDEX_STATS_TTL
+            return self._index_stats
         except Exception as e:
             logger.error(f"Error getting index stats: {e}")
             raise
@@ -162,8 +251,10 @@ class RetrievalService:
             
             return {
                 "status": "connected",
+                "backend": settings.retrieval_backend,
                 "pinecone_index": settings.pinecone_index_name,
-                "total_vectors": stats["total_vectors"]
+                "total_vectors": stats["total_vectors"],
+                "cache": self.cache_stats()
             }
             
         except Exception as e:
@@ -174,5 +265,152 @@ class RetrievalService:
             }
 
 
-# Global retrieval service instance
-retrieval_service = RetrievalService()
+def _matches_filter(metadata: Dict[str, Any], filter_dict: Dict[str, Any]) -> bool:
+    """Evaluate the subset of Pinecone's metadata filter syntax used by clients"""
+    for field, condition in filter_dict.items():
+        if field == "$and":
+            if not all(_matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if field == "$or":
+            if not any(_matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            if op == "$eq":
+                ok = value == operand
+            elif op == "$ne":
+                ok = value != operand
+            elif op == "$in":
+                ok = value in operand
+            elif op == "$nin":
+                ok = value not in operand
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                ok = {
+                    "$gt": value > operand,
+                    "$gte": value >= operand,
+                    "$lt": value < operand,
+                    "$lte": value <= operand,
+                }[op]
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+            if not ok:
+                return False
+    return True
+
+
+class LocalFaissRetrievalService(RetrievalService):
+    """
+    Retrieval from a local Faiss copy of the Pinecone index
+    
+    Removes the network round trip per query for corpora that fit on the
+    host. The index file and its metadata sidecar are written by
+    export_pinecone_faiss.py with the Pinecone index's metric, so scores
+    match Pinecone's: queries are L2-normalised only for cosine indexes.
+    
+    Filtered queries scan FILTER_OVERFETCH candidates per requested
+    result and widen the scan until top_k matches pass the filter. On an
+    IVF index only the nprobe closest lists are searched, so a very
+    selective filter can still return fewer than top_k matches.
+    """
+    
+    # Candidates scanned per requested result when a metadata filter is set
+    FILTER_OVERFETCH = 10
+    # Growth factor of the candidate scan while too few candidates pass the filter
+    FILTER_WIDEN = 4
+    
+    def _initialize(self):
+        """Load the Faiss index and chunk metadata"""
+        try:
+            import faiss
+            path = settings.local_index_path
+            try:
+                # IVF inverted lists are paged in from disk on demand
+                self.index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError:
+                self.index = faiss.read_index(path)
+            
+            with open(os.path.splitext(path)[0] + ".meta.json", "rb") as f:
+                sidecar = orjson.loads(f.read())
+            self._metric = sidecar["metric"]
+            records = sidecar["records"]
+            self._ids = [record["id"] for record in records]
+            self._metadata = [record.get("metadata") or {} for record in records]
+            
+            if len(self._ids) != self.index.ntotal:
+                raise ValueError(
+                    f"Metadata has {len(self._ids)} records but index holds {self.index.ntotal} vectors"
+                )
+            
+            logger.info(f"Loaded local Faiss index from {path} ({self.index.ntotal} {self._metric} vectors)")
+            
+        except Exception as e:
+            logger.error(f"Failed to initialize local retrieval service: {e}")
+            raise
+    
+    def _query(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        filter_dict: Optional[Dict[str, Any]]
+    ):
+        """Search the local index, returning matches shaped like Pinecone's"""
+        query = np.array(query_embedding, dtype=np.float32, ndmin=2)
+        if self._metric == "cosine":
+            query /= max(float(np.linalg.norm(query)), 1e-12)
+        
+        total = self.index.ntotal
+        k = min(top_k * self.FILTER_OVERFETCH if filter_dict else top_k, total)
+        while True:
+            scores, positions = self.index.search(query, k)
+            
+            matches = []
+            found = 0
+            for score, position in zip(scores[0].tolist(), positions[0].tolist()):
+                if position < 0:
+                    continue
+                found += 1
+                metadata = self._metadata[position]
+                if filter_dict and not _matches_filter(metadata, filter_dict):
+                    continue
+                matches.append(SimpleNamespace(id=self._ids[position], score=score, metadata=metadata))
+                if len(matches) == top_k:
+                    break
+            
+            # Done once enough passed, or the search has no more candidates to give
+            if len(matches) == top_k or k >= total or found < k:
+                return SimpleNamespace(matches=matches)
+            k = min(k * self.FILTER_WIDEN, total)
+    
+    async def get_index_stats(self) -> Dict[str, Any]:
+        """Local index statistics, in the same shape as the Pinecone stats"""
+        return {
+            "total_vectors": self.index.ntotal,
+            "dimension": self.index.d,
+            "index_fullness": 0.0,
+            "namespaces": {}
+        }
+
+
+# Global retrieval service instance (created when needed, so importing this
+# module does not connect to Pinecone)
+retrieval_service = None
+_retrieval_service_lock = Lock()
+
+def get_retrieval_service() -> RetrievalService:
+    """Get or create the retrieval service for the configured backend"""
+    global retrieval_service
+    if retrieval_service is None:
+        with _retrieval_service_lock:
+            if retrieval_service is None:
+                if settings.retrieval_backend == "faiss":
+                    retrieval_service = LocalFaissRetrievalService()
+                else:
+                    retrieval_service = RetrievalService()
+    return retrieval_service
@@ -0,0 +1,38 @@
+"""
+Coalescing of identical in-flight async calls
+"""
+import asyncio
+from typing import Any, Callable, Coroutine, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time.
+
+    Callers that arrive while a call for the same key is still running wait
+    for its result (or exception) instead of starting their own.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Coroutine[Any, Any, Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            # The shared call runs as its own task, so it finishes even if the
+            # caller that started it is cancelled
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # shield so one cancelled caller does not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark retrieved so a call whose callers all left does not log a warning
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
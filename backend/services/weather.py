@@ -1,12 +1,81 @@
+import ast
+import asyncio
 import os
-import requests
+from threading import Lock
+from typing import Callable, List, Optional, Tuple, Union
+
+import httpx
+import orjson
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
+from core.logging import get_logger
+from services.singleflight import SingleFlight
+
 load_dotenv()
 
+logger = get_logger(__name__)
+
 API_KEY = os.getenv("OPENWEATHER_API_KEY")
 BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
 
+# Shared keep-alive client for OpenWeather calls (closed on app shutdown)
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50),
+            timeout=5.0
+        )
+    return _http_client
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+# OpenWeather refreshes roughly every 10 minutes, so responses are reused
+# per location for that long
+WEATHER_CACHE_TTL = 600
+
+
+class _WeatherCache(TTLCache):
+    """TTLCache that counts entries evicted to make room for new ones"""
+
+    def __init__(self, maxsize, ttl):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.evictions = 0
+
+    def popitem(self):
+        self.evictions += 1
+        return super().popitem()
+
+
+_weather_cache = _WeatherCache(maxsize=5000, ttl=WEATHER_CACHE_TTL)
+_weather_cache_lock = Lock()
+_weather_cache_hits = 0
+_weather_cache_misses = 0
+# Concurrent misses for one location share a single OpenWeather call
+_weather_flight = SingleFlight()
+
+def weather_cache_stats() -> dict:
+    """Hit/miss/eviction counters for the weather response cache"""
+    with _weather_cache_lock:
+        total = _weather_cache_hits + _weather_cache_misses
+        return {
+            "hits": _weather_cache_hits,
+            "misses": _weather_cache_misses,
+            "evictions": _weather_cache.evictions,
+            "hit_rate": round(_weather_cache_hits / total, 4) if total else 0.0,
+            "size": len(_weather_cache),
+            "maxsize": _weather_cache.maxsize,
+            "ttl_seconds": WEATHER_CACHE_TTL
+        }
+
 # Crop-specific rules keyed by canonical crop names (lowercase)
 # Keep the set focused initially; extend as needed
 CROP_SPECIFIC_RULES = {
@@ -714,6 +783,101 @@ CROP_SPECIFIC_RULES = {
     }
 }
 
+def _compile_rules(table: dict) -> dict:
+    """Flatten the rule table once into crop -> ((category, condition, message), ...)"""
+    return {
+        crop: tuple(
+            (category, rule["condition"], rule["message"])
+            for category, rule_list in categories.items()
+            for rule in rule_list
+            if callable(rule.get("condition")) and rule.get("message")
+        )
+        for crop, categories in table.items()
+    }
+
+_COMPILED_RULES = _compile_rules(CROP_SPECIFIC_RULES)
+
+def _condition_sources() -> dict:
+    """
+    Expression source of every rule condition, read from the
+    CROP_SPECIFIC_RULES literal in this file: crop -> [(message, expr), ...]
+    """
+    with open(__file__, encoding="utf-8") as source_file:
+        tree = ast.parse(source_file.read())
+    table = next(
+        node.value for node in tree.body
+        if isinstance(node, ast.Assign)
+        and any(isinstance(t, ast.Name) and t.id == "CROP_SPECIFIC_RULES" for t in node.targets)
+    )
+    sources = {}
+    for crop_node, categories_node in zip(table.keys, table.values):
+        entries = []
+        for rule_list in categories_node.values:
+            for rule in rule_list.elts:
+                fields = {k.value: v for k, v in zip(rule.keys, rule.values)}
+                condition, message = fields["condition"], fields["message"]
+                if [a.arg for a in condition.args.args] != ["w", "f"]:
+                    raise ValueError("rule lambdas must take (w, f)")
+                entries.append((message.value, ast.unparse(condition.body)))
+        sources[crop_node.value] = entries
+    return sources
+
+def _fuse_crop_rules(rules: tuple, conditions: list) -> Callable[[dict, dict], dict]:
+    """
+    Compile one function evaluating all of a crop's rules inline, so a
+    request costs one call instead of a lambda call per rule. Each rule
+    keeps its own try block, as in the unfused loop.
+    """
+    lines = ["def _rules(w, f):", "    fired = {}"]
+    for i, ((category, _, _), expr) in enumerate(zip(rules, conditions)):
+        lines += [
+            "    try:",
+            f"        if {expr}:",
+            f"            fired.setdefault({category!r}, []).append(_M[{i}])",
+            "    except Exception:",
+            "        pass",
+        ]
+    lines.append("    return fired")
+    namespace = {"_M": tuple(message for _, _, message in rules)}
+    exec(compile("\n".join(lines), "<crop rules>", "exec"), namespace)
+    return namespace["_rules"]
+
+def _fuse_rules() -> dict:
+    """Fused evaluator per crop; crops whose source doesn't match the table keep the loop"""
+    try:
+        sources = _condition_sources()
+    except Exception as e:
+        logger.warning(f"Crop rules not fused, evaluating rule by rule: {e}")
+        return {}
+    fused = {}
+    for crop, rules in _COMPILED_RULES.items():
+        entries = sources.get(crop, [])
+        # The literal must describe exactly the rules live in the table
+        if [message for message, _ in entries] == [message for _, _, message in rules]:
+            fused[crop] = _fuse_crop_rules(rules, [expr for _, expr in entries])
+    unfused = sorted(set(_COMPILED_RULES) - set(fused))
+    if unfused:
+        logger.warning(f"Crop rules not fused for {unfused}, evaluating rule by rule")
+    return fused
+
+_FUSED_RULES = _fuse_rules()
+
+def evaluate_crop_rules(crop: str, weather_info: dict, farm: dict) -> dict:
+    """Messages of the rules that fire for a canonical crop name, grouped by category"""
+    fused = _FUSED_RULES.get(crop)
+    if fused is not None:
+        return fused(weather_info, farm)
+    
+    fired = {}
+    for category, condition, message in _COMPILED_RULES.get(crop, ()):
+        try:
+            if condition(weather_info, farm):
+                fired.setdefault(category, []).append(message)
+        except Exception:
+            # ignore condition evaluation errors (e.g. missing soil readings)
+            pass
+    return fired
+
 def _normalize_crop_name(name: str) -> str:
     if not name:
         return "generic"
@@ -732,8 +896,28 @@ def _normalize_crop_name(name: str) -> str:
     
     return s
 
-def get_weather_by_location(city: str, state: str = None, country: str = "IN") -> dict:
-    """Fetch current weather for a given location"""
+async def get_weather_by_location(city: str, state: str = None, country: str = "IN") -> dict:
+    """Fetch current weather for a given location, served from cache when fresh"""
+    global _weather_cache_hits, _weather_cache_misses
+    key = (city.strip().lower(), (state or "").strip().lower(), country.strip().upper())
+    with _weather_cache_lock:
+        weather_info = _weather_cache.get(key)
+        if weather_info is not None:
+            _weather_cache_hits += 1
+            return dict(weather_info)
+        _weather_cache_misses += 1
+
+    weather_info = await _weather_flight.do(key, lambda: _fetch_and_cache(key, city, state, country))
+    return dict(weather_info)
+
+async def _fetch_and_cache(key: tuple, city: str, state: str, country: str) -> dict:
+    weather_info = await _fetch_weather(city, state, country)
+    with _weather_cache_lock:
+        _weather_cache[key] = weather_info
+    return weather_info
+
+async def _fetch_weather(city: str, state: str = None, country: str = "IN") -> dict:
+    """Call the OpenWeather current-weather API"""
     location_query = f"{city},{country}"
     if state:
         location_query = f"{city},{state},{country}"
@@ -744,11 +928,11 @@ def get_weather_by_location(city: str, state: str = None, country: str = "IN") -
         "units": "metric"  # Celsius
     }
     
-    response = requests.get(BASE_URL, params=params)
+    response = await get_http_client().get(BASE_URL, params=params)
     if response.status_code != 200:
         raise Exception(f"Weather API failed: {response.text}")
     
-    data = response.json()
+    data = orjson.loads(response.content)
     
     # Extract precipitation data (rain volume in mm for the last hour)
     rain_data = data.get("rain", {})
@@ -767,9 +951,22 @@ def get_weather_by_location(city: str, state: str = None, country: str = "IN") -
     
     return weather_info
 
-def get_weather(city: str, state: str = None, country: str = "IN") -> dict:
+async def get_weather_many(locations: List[Tuple[str, Optional[str], str]]) -> List[Union[dict, Exception]]:
+    """
+    Fetch weather for several (city, state, country) locations concurrently
+    
+    Lookups share the cache and the pooled HTTP/2 client, so N cold locations
+    cost about one round trip instead of N. A failed lookup is returned as
+    its exception in place rather than failing the whole batch.
+    """
+    return await asyncio.gather(
+        *(get_weather_by_location(city, state, country) for city, state, country in locations),
+        return_exceptions=True
+    )
+
+async def get_weather(city: str, state: str = None, country: str = "IN") -> dict:
     """Legacy function for backward compatibility"""
-    return get_weather_by_location(city, state, country)
+    return await get_weather_by_location(city, state, country)
 
 def generate_farm_alerts(weather_info: dict, farm: dict) -> dict:
     """
@@ -938,32 +1135,16 @@ def generate_farm_alerts(weather_info: dict, farm: dict) -> dict:
         if not primary:
             # fallback to single crop_type field
             primary = [farm.get("crop_type", "generic")]
-        matched_msgs = {k: [] for k in alerts.keys()}
         matched_per_crop: dict[str, dict[str, list[str]]] = {}
         
         for raw_name in primary:
-            key = _normalize_crop_name(str(raw_name))
-            rules = CROP_SPECIFIC_RULES.get(key)
-            
-            if not rules:
+            fired = evaluate_crop_rules(_normalize_crop_name(str(raw_name)), weather_info, farm)
+            if not fired:
                 continue
-                
-            for category, rule_list in rules.items():
-                for rule in rule_list:
-                    cond = rule.get("condition")
-                    msg = rule.get("message")
-                    if callable(cond) and msg:
-                        try:
-                            condition_met = cond(weather_info, farm)
-                            if condition_met:
-                                # prefix with crop name for clarity
-                                prefixed = f"[{raw_name}] {msg}"
-                                matched_msgs[category].append(prefixed)
-                                crop_bucket = matched_per_crop.setdefault(str(raw_name), {})
-                                crop_bucket.setdefault(category, []).append(msg)
-                        except Exception:
-                            # ignore condition evaluation errors
-                            pass
+            
+            crop_bucket = matched_per_crop.setdefault(str(raw_name), {})
+            for category, messages in fired.items():
+                crop_bucket.setdefault(category, []).extend(messages)
         
         # Don't merge crop-specific messages into general alerts since we display them separately
         # Just add the crop_specific_alerts to the response
@@ -0,0 +1,134 @@
+"""
+Unit tests for the micro-batcher
+Tests: backend/services/batching.py
+"""
+import asyncio
+
+import pytest
+
+
+class TestMicroBatcher:
+    """Test suite for MicroBatcher"""
+    
+    def test_concurrent_items_share_one_batch(self):
+        """Test that items submitted together are coalesced"""
+        from services.batching import MicroBatcher
+        
+        calls = []
+        
+        def batch_fn(items):
+            calls.append(list(items))
+            return [item * 2 for item in items]
+        
+        async def scenario():
+            batcher = MicroBatcher(batch_fn, max_batch_size=8, max_latency_ms=50)
+            results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+            await batcher.stop()
+            return results
+        
+        results = asyncio.run(scenario())
+        
+        assert results == [0, 2, 4, 6, 8]
+        assert calls == [[0, 1, 2, 3, 4]]
+    
+    def test_batch_size_is_capped(self):
+        """Test that batches never exceed max_batch_size"""
+        from services.batching import MicroBatcher
+        
+        sizes = []
+        
+        def batch_fn(items):
+            sizes.append(len(items))
+            return items
+        
+        async def scenario():
+            batcher = MicroBatcher(batch_fn, max_batch_size=3, max_latency_ms=50)
+            results = await asyncio.gather(*(batcher.submit(i) for i in range(7)))
+            await batcher.stop()
+            return results
+        
+        assert asyncio.run(scenario()) == list(range(7))
+        assert max(sizes) <= 3
+    
+    def test_batch_error_propagates_to_callers(self):
+        """Test that a failing batch raises in every waiting caller"""
+        from services.batching import MicroBatcher
+        
+        def batch_fn(items):
+            raise RuntimeError("model failure")
+        
+        async def scenario():
+            batcher = MicroBatcher(batch_fn, max_latency_ms=5)
+            try:
+                await batcher.submit(1)
+            finally:
+                await batcher.stop()
+        
+        with pytest.raises(RuntimeError, match="model failure"):
+            asyncio.run(scenario())
+
+    
+    def test_short_result_fails_every_caller(self):
+        """Test that a batch_fn returning too few results fails callers instead of hanging"""
+        from services.batching import MicroBatcher
+        
+        def batch_fn(items):
+            return items[:1]
+        
+        async def scenario():
+            batcher = MicroBatcher(batch_fn, max_batch_size=8, max_latency_ms=50)
+            results = await asyncio.wait_for(
+                asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True),
+                timeout=2
+            )
+            await batcher.stop()
+            return results
+        
+        results = asyncio.run(scenario())
+        
+        assert len(results) == 3
+        assert all(isinstance(result, ValueError) for result in results)
+
+
+class TestThreadedMicroBatcher:
+    """Test suite for ThreadedMicroBatcher"""
+    
+    def test_concurrent_threads_share_one_batch(self):
+        """Test that items submitted from several threads are coalesced"""
+        from concurrent.futures import ThreadPoolExecutor
+        from services.batching import ThreadedMicroBatcher
+        
+        calls = []
+        
+        def batch_fn(items):
+            calls.append(len(items))
+            return [item * 2 for item in items]
+        
+        batcher = ThreadedMicroBatcher(batch_fn, max_batch_size=8, max_latency_ms=50)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(batcher.submit, range(4)))
+        
+        assert results == [0, 2, 4, 6]
+        assert sum(calls) == 4
+        assert len(calls) < 4
+    
+    def test_batch_error_propagates_to_callers(self):
+        """Test that a failing batch raises in the waiting thread"""
+        from services.batching import ThreadedMicroBatcher
+        
+        def batch_fn(items):
+            raise RuntimeError("model failure")
+        
+        batcher = ThreadedMicroBatcher(batch_fn, max_latency_ms=5)
+        
+        with pytest.raises(RuntimeError, match="model failure"):
+            batcher.submit(1)
+    
+    def test_short_result_fails_every_caller(self):
+        """Test that a batch_fn returning too few results fails the thread instead of hanging"""
+        from services.batching import ThreadedMicroBatcher
+        
+        batcher = ThreadedMicroBatcher(lambda items: [], max_latency_ms=5)
+        
+        with pytest.raises(ValueError, match="0 results for 1 items"):
+            batcher.submit(1)
@@ -0,0 +1,80 @@
+"""
+Unit tests for the vectorized crop classifier
+Tests: backend/routers/crop_predict.py
+"""
+import numpy as np
+import pytest
+
+
+def _random_rows(rng, n):
+    """Feature rows spanning the request ranges: N, P, K, temperature, humidity, ph, rainfall"""
+    low = np.array([0, 0, 0, -10, 0, 0, 0], dtype=np.float64)
+    high = np.array([150, 150, 210, 50, 100, 10, 300], dtype=np.float64)
+    return rng.uniform(low, high, size=(n, 7)).astype(np.float32)
+
+
+class TestVectorizedGaussianNB:
+    """Test suite for VectorizedGaussianNB"""
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_matches_sklearn_predict(self, seed):
+        """Test that float32 batches get the labels GaussianNB.predict gives"""
+        from sklearn.naive_bayes import GaussianNB
+        from routers.crop_predict import VectorizedGaussianNB
+
+        rng = np.random.default_rng(seed)
+        centers = _random_rows(rng, 6)
+        X = np.concatenate([center + rng.normal(0, 5, size=(40, 7)) for center in centers])
+        y = np.repeat([f"crop-{i}" for i in range(6)], 40)
+        nb = GaussianNB().fit(X, y)
+
+        rows = _random_rows(rng, 2000)
+        expected = nb.predict(rows.astype(np.float64))
+
+        np.testing.assert_array_equal(VectorizedGaussianNB(nb).predict(rows), expected)
+
+    def test_loaded_predictor_matches_pickled_model(self):
+        """Test that the production predictor agrees with the pickled model"""
+        from routers.crop_predict import model, predictor
+
+        rows = _random_rows(np.random.default_rng(0), 2000)
+
+        np.testing.assert_array_equal(predictor.predict(rows), model.predict(rows.astype(np.float64)))
+
+    def test_predict_batch_uses_float32_buffer(self):
+        """Test that the batch path returns one label per row from the reused buffer"""
+        from routers.crop_predict import _predict_batch, model
+
+        rows = [tuple(row) for row in _random_rows(np.random.default_rng(1), 10).tolist()]
+
+        expected = [str(label) for label in model.predict(np.array(rows, dtype=np.float32).astype(np.float64))]
+        assert _predict_batch(rows) == expected
+
+
+class TestCropFeatures:
+    """Test suite for the crop request schema"""
+
+    VALID = dict(N=90, P=42, K=43, temperature=20.9, humidity=82.0, ph=6.5, rainfall=202.9)
+
+    @pytest.mark.parametrize("field, value, message", [
+        ("temperature", 61, "Temperature must be between -10 and 60 °C"),
+        ("humidity", 101, "Humidity must be between 0 and 100%"),
+        ("ph", -0.5, "pH must be between 0 and 14"),
+        ("N", -1, "Values must be non-negative"),
+        ("rainfall", -1, "Values must be non-negative"),
+    ])
+    def test_out_of_range_messages(self, field, value, message):
+        """Test that range errors keep the messages shown in the UI"""
+        from pydantic import ValidationError
+        from routers.crop_predict import CropFeatures
+
+        with pytest.raises(ValidationError) as exc_info:
+            CropFeatures(**{**self.VALID, field: value})
+
+        assert message in exc_info.value.errors()[0]["msg"]
+
+    def test_features_are_hashable(self):
+        """Test that validated features can key the prediction cache"""
+        from routers.crop_predict import CropFeatures
+
+        assert hash(CropFeatures(**self.VALID)) == hash(CropFeatures(**self.VALID))
@@ -107,6 +107,62 @@ class TestEmbeddingService:
         
         assert len(emb1) == len(emb2) == len(emb3) == 768
 
+    @patch('services.embeddings.SentenceTransformer')
+    def test_embed_query_cache_hit(self, mock_transformer):
+        """Test that repeated queries are served from the embedding cache"""
+        from services.embeddings import EmbeddingService
+
+        mock_model = MagicMock()
+        mock_model.encode.return_value = np.array([[0.1] * 768])
+        mock_transformer.return_value = mock_model
+
+        service = EmbeddingService()
+        emb1, _ = service.embed_query("Best fertilizer for rice?")
+        emb2, _ = service.embed_query("  Best fertilizer   for rice?  ")
+
+        assert emb1 is emb2
+        mock_model.encode.assert_called_once()
+
+    @patch('services.embeddings.SentenceTransformer')
+    def test_embed_queries_encodes_only_misses(self, mock_transformer):
+        """Test that batch embedding stacks uncached queries into one encode call"""
+        from services.embeddings import EmbeddingService
+
+        mock_model = MagicMock()
+        mock_model.encode.side_effect = [
+            np.array([[0.1] * 768]),
+            np.array([[0.2] * 768, [0.3] * 768])
+        ]
+        mock_transformer.return_value = mock_model
+
+        service = EmbeddingService()
+        service.embed_query("Query A")
+        embeddings, latency = service.embed_queries(["Query B", "Query A", "Query C"])
+
+        assert [emb[0] for emb in embeddings] == pytest.approx([0.2, 0.1, 0.3])
+        assert mock_model.encode.call_count == 2
+        mock_model.encode.assert_called_with(["Query B", "Query C"])
+
+    @patch('services.embeddings.SentenceTransformer')
+    def test_embed_queries_counts_cache_hits(self, mock_transformer):
+        """Test that batch embedding is reflected in cache_stats"""
+        from services.embeddings import EmbeddingService
+
+        mock_model = MagicMock()
+        mock_model.encode.side_effect = [
+            np.array([[0.1] * 768, [0.2] * 768]),
+            np.array([[0.3] * 768])
+        ]
+        mock_transformer.return_value = mock_model
+
+        service = EmbeddingService()
+        service.embed_queries(["Query A", "Query B"])
+        service.embed_queries(["Query A", "Query C", "Query B"])
+
+        stats = service.cache_stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 3
+
 
 # Expected Results:
 # - All tests should pass
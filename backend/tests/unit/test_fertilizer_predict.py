@@ -0,0 +1,37 @@
+"""
+Unit tests for batched fertilizer prediction
+Tests: backend/routers/fertilizer_predict.py
+"""
+import numpy as np
+import pytest
+
+
+def _random_rows(pipeline, rng, n):
+    """Rows within three standard deviations of the training data, as request values"""
+    scaler = pipeline[0]
+    X = rng.uniform(scaler.mean_ - 3 * scaler.scale_, scaler.mean_ + 3 * scaler.scale_, size=(n, 8))
+    X[:, 3] = rng.integers(0, 5, n)   # SoilType
+    X[:, 4] = rng.integers(0, 11, n)  # CropType
+    return np.round(X, 2)
+
+
+class TestFertilizerPredictBatch:
+    """Test suite for the fertilizer batch predictor"""
+
+    def test_batch_matches_float64_pipeline(self):
+        """Test that batched predictions match the pipeline on float64 input"""
+        from routers.fertilizer_predict import MAX_BATCH, FERT_NAMES, _predict_batch, onnx_session, xgb_model
+
+        if xgb_model is None or onnx_session is not None:
+            pytest.skip("joblib fertilizer pipeline not in use")
+
+        # Near-threshold rows are rare (~1 in 20k), so the sample has to be large
+        X = _random_rows(xgb_model, np.random.default_rng(0), 3200 * MAX_BATCH)
+        labels = np.asarray(xgb_model.predict(X), dtype=np.int64)
+        expected = FERT_NAMES[np.clip(labels, 0, len(FERT_NAMES) - 1)].tolist()
+
+        predicted = []
+        for start in range(0, len(X), MAX_BATCH):
+            predicted += _predict_batch([tuple(row) for row in X[start:start + MAX_BATCH].tolist()])
+
+        assert predicted == expected
@@ -0,0 +1,110 @@
+"""
+Unit tests for local metadata filtering and filtered Faiss search
+Tests: backend/services/retrieval.py
+"""
+import numpy as np
+import pytest
+
+
+METADATA = {"crop": "rice", "state": "Punjab", "year": 2021, "season": "kharif"}
+
+
+class TestMatchesFilter:
+    """Test suite for _matches_filter"""
+
+    @pytest.mark.parametrize("filter_dict, expected", [
+        ({"crop": "rice"}, True),
+        ({"crop": "wheat"}, False),
+        ({"crop": {"$eq": "rice"}}, True),
+        ({"crop": {"$ne": "rice"}}, False),
+        ({"crop": {"$in": ["rice", "wheat"]}}, True),
+        ({"crop": {"$nin": ["rice", "wheat"]}}, False),
+        ({"year": {"$gt": 2020}}, True),
+        ({"year": {"$gte": 2021}}, True),
+        ({"year": {"$lt": 2021}}, False),
+        ({"year": {"$lte": 2021}}, True),
+        ({"year": {"$gte": 2020, "$lt": 2021}}, False),
+        ({"crop": "rice", "state": "Kerala"}, False),
+        ({"$and": [{"crop": "rice"}, {"season": "kharif"}]}, True),
+        ({"$and": [{"crop": "rice"}, {"season": "rabi"}]}, False),
+        ({"$or": [{"crop": "wheat"}, {"state": "Punjab"}]}, True),
+        ({"$or": [{"crop": "wheat"}, {"state": "Kerala"}]}, False),
+        ({}, True),
+    ])
+    def test_operators(self, filter_dict, expected):
+        """Test each supported operator against one metadata record"""
+        from services.retrieval import _matches_filter
+
+        assert _matches_filter(METADATA, filter_dict) is expected
+
+    def test_missing_field(self):
+        """Test that absent fields fail comparisons and equality but pass $ne/$nin"""
+        from services.retrieval import _matches_filter
+
+        assert _matches_filter(METADATA, {"district": {"$gt": 1}}) is False
+        assert _matches_filter(METADATA, {"district": "Ludhiana"}) is False
+        assert _matches_filter(METADATA, {"district": {"$ne": "Ludhiana"}}) is True
+        assert _matches_filter(METADATA, {"district": {"$nin": ["Ludhiana"]}}) is True
+
+    def test_unsupported_operator(self):
+        """Test that unknown operators are rejected rather than ignored"""
+        from services.retrieval import _matches_filter
+
+        with pytest.raises(ValueError):
+            _matches_filter(METADATA, {"crop": {"$regex": "ri.*"}})
+
+
+class _FakeIndex:
+    """Exact search over positions 0..n-1, scored in position order"""
+
+    def __init__(self, ntotal):
+        self.ntotal = ntotal
+        self.searched = []
+
+    def search(self, query, k):
+        self.searched.append(k)
+        positions = np.arange(k, dtype=np.int64)[None, :]
+        return -positions.astype(np.float32), positions
+
+
+class TestLocalFilteredSearch:
+    """Test suite for LocalFaissRetrievalService filtered queries"""
+
+    def _service(self, metadata):
+        from services.retrieval import LocalFaissRetrievalService
+
+        service = LocalFaissRetrievalService.__new__(LocalFaissRetrievalService)
+        service.index = _FakeIndex(len(metadata))
+        service._metric = "dotproduct"
+        service._ids = [f"chunk-{i}" for i in range(len(metadata))]
+        service._metadata = metadata
+        return service
+
+    def test_widens_until_top_k_pass(self):
+        """Test that a selective filter widens the scan instead of returning short"""
+        metadata = [{"crop": "wheat"}] * 500 + [{"crop": "rice"}] * 5
+        service = self._service(metadata)
+
+        result = service._query(np.ones(4, dtype=np.float32), 5, {"crop": "rice"})
+
+        assert [match.id for match in result.matches] == [f"chunk-{i}" for i in range(500, 505)]
+        assert service.index.searched == [50, 200, 505]
+
+    def test_returns_all_matches_when_fewer_exist(self):
+        """Test that the scan stops at the full index when few records pass"""
+        metadata = [{"crop": "wheat"}] * 100 + [{"crop": "rice"}] * 2
+        service = self._service(metadata)
+
+        result = service._query(np.ones(4, dtype=np.float32), 5, {"crop": "rice"})
+
+        assert len(result.matches) == 2
+        assert service.index.searched[-1] == 102
+
+    def test_unfiltered_search_is_not_widened(self):
+        """Test that queries without a filter search top_k once"""
+        service = self._service([{}] * 100)
+
+        result = service._query(np.ones(4, dtype=np.float32), 5, None)
+
+        assert len(result.matches) == 5
+        assert service.index.searched == [5]
@@ -133,6 +133,21 @@ class TestJWTTokens:
         # Token should expire in the future
         assert exp_time > now
 
+    def test_decode_access_token_cached(self):
+        """Test that a verified token is not re-decoded on repeat calls"""
+        from unittest.mock import patch
+        from core import security
+
+        token = security.create_access_token({"email": "test@example.com"})
+        security.clear_token_cache()
+
+        first = security.decode_access_token(token)
+        with patch.object(security.jwt, "decode") as mock_decode:
+            second = security.decode_access_token(token)
+
+        assert second == first
+        mock_decode.assert_not_called()
+
 
 # Expected Results:
 # - All tests should pass
@@ -0,0 +1,93 @@
+"""
+Unit tests for in-flight request coalescing
+Tests: backend/services/singleflight.py
+"""
+import asyncio
+
+import pytest
+
+
+class TestSingleFlight:
+    """Test suite for SingleFlight"""
+    
+    def test_identical_calls_share_one_execution(self):
+        """Test that concurrent calls for one key run the work once"""
+        from services.singleflight import SingleFlight
+        
+        calls = []
+        
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+        
+        async def scenario():
+            flight = SingleFlight()
+            results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+            return results, len(flight)
+        
+        results, pending = asyncio.run(scenario())
+        
+        assert results == ["result"] * 5
+        assert len(calls) == 1
+        assert pending == 0
+    
+    def test_different_keys_run_separately(self):
+        """Test that distinct keys are not coalesced"""
+        from services.singleflight import SingleFlight
+        
+        async def scenario():
+            flight = SingleFlight()
+            return await asyncio.gather(
+                flight.do("a", lambda: asyncio.sleep(0.01, result="a")),
+                flight.do("b", lambda: asyncio.sleep(0.01, result="b"))
+            )
+        
+        assert asyncio.run(scenario()) == ["a", "b"]
+    
+    def test_error_propagates_to_all_waiters(self):
+        """Test that a failing call raises in every coalesced caller"""
+        from services.singleflight import SingleFlight
+        
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream failure")
+        
+        async def scenario():
+            flight = SingleFlight()
+            return await asyncio.gather(
+                *(flight.do("key", work) for _ in range(3)),
+                return_exceptions=True
+            )
+        
+        results = asyncio.run(scenario())
+        
+        assert all(isinstance(r, RuntimeError) for r in results)
+    
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        """Test that a follower still gets the result when the first caller is cancelled"""
+        from services.singleflight import SingleFlight
+        
+        calls = []
+        
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+        
+        async def scenario():
+            flight = SingleFlight()
+            leader = asyncio.create_task(flight.do("key", work))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(flight.do("key", work))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            result = await follower
+            return leader.cancelled(), result, len(flight)
+        
+        leader_cancelled, result, pending = asyncio.run(scenario())
+        
+        assert leader_cancelled
+        assert result == "result"
+        assert len(calls) == 1
+        assert pending == 0
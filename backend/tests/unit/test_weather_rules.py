@@ -0,0 +1,73 @@
+"""
+Unit tests for crop-specific weather rule evaluation
+Tests: backend/services/weather.py
+"""
+import random
+
+import pytest
+
+
+def _loop_rules(rules, weather_info, farm):
+    """Reference evaluation: one condition call per rule, skipping errors"""
+    fired = {}
+    for category, condition, message in rules:
+        try:
+            if condition(weather_info, farm):
+                fired.setdefault(category, []).append(message)
+        except Exception:
+            pass
+    return fired
+
+
+def _random_inputs(rng):
+    """Random weather/farm readings, with soil readings sometimes missing"""
+    weather_info = {
+        "temperature": rng.uniform(-5, 45),
+        "humidity": rng.uniform(10, 100),
+    }
+    farm = {"growth_stage": rng.choice(["flowering", "pre-flowering", "berry swelling", None])}
+    if rng.random() < 0.7:
+        farm["soil_moisture"] = rng.uniform(0, 100)
+    if rng.random() < 0.5:
+        farm["soil_ph"] = rng.uniform(4.5, 8.5)
+    for key in ["soil_nitrogen", "soil_potassium", "soil_zinc", "soil_boron",
+                "soil_organic_matter", "soil_phosphorus", "soil_calcium"]:
+        if rng.random() < 0.5:
+            farm[key] = rng.choice(["low", "high"])
+    if rng.random() < 0.3:
+        farm["calcium_deficiency"] = rng.choice([True, False])
+    return weather_info, farm
+
+
+class TestCropRules:
+    """Test suite for fused crop rule evaluation"""
+
+    def test_every_crop_is_fused(self):
+        """Test that no crop falls back to rule-by-rule evaluation"""
+        from services.weather import _COMPILED_RULES, _FUSED_RULES
+
+        assert set(_FUSED_RULES) == set(_COMPILED_RULES)
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_fused_matches_rule_loop(self, seed):
+        """Test that fused functions fire the same messages as the per-rule loop"""
+        from services.weather import _COMPILED_RULES, _FUSED_RULES
+
+        rng = random.Random(seed)
+        for _ in range(500):
+            weather_info, farm = _random_inputs(rng)
+            for crop, rules in _COMPILED_RULES.items():
+                assert _FUSED_RULES[crop](weather_info, farm) == _loop_rules(rules, weather_info, farm)
+
+    def test_missing_readings_skip_rules(self):
+        """Test that rules reading absent values are skipped, not raised"""
+        from services.weather import _COMPILED_RULES, evaluate_crop_rules
+
+        for crop in _COMPILED_RULES:
+            assert evaluate_crop_rules(crop, {}, {}) == _loop_rules(_COMPILED_RULES[crop], {}, {})
+
+    def test_unknown_crop_fires_nothing(self):
+        """Test that crops without rules return no messages"""
+        from services.weather import evaluate_crop_rules
+
+        assert evaluate_crop_rules("not-a-crop", {"temperature": 40, "humidity": 90}, {}) == {}